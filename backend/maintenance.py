@@ -0,0 +1,58 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+import typer
+from dotenv import load_dotenv
+
+from services.database import init_database, DatabaseService
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+app = typer.Typer(help="Maintenance jobs for the Mer database")
+
+def run(job):
+    """Connect to the database and run a maintenance coroutine"""
+    async def main():
+        init_database(os.environ['MONGO_URL'], os.environ['DB_NAME'], os.environ.get('MESSAGE_STORAGE', 'documents'))
+        return await job()
+    return asyncio.run(main())
+
+@app.command()
+def backfill_match_summaries():
+    """Rebuild the last-message summary on every match from the messages collection"""
+    updated = run(DatabaseService.backfill_match_summaries)
+    typer.echo(f"Updated {updated} matches")
+
+@app.command()
+def recount_unread():
+    """Recompute every match's unread counters from the messages collection"""
+    updated = run(DatabaseService.recount_unread)
+    typer.echo(f"Updated {updated} matches")
+
+@app.command()
+def migrate_messages_to_buckets():
+    """Pack per-message documents into message buckets; run once MESSAGE_STORAGE=buckets is live"""
+    if os.environ.get('MESSAGE_STORAGE') != 'buckets':
+        # Documents-mode servers do not read buckets, so migrated messages would vanish
+        typer.echo("Set MESSAGE_STORAGE=buckets (and deploy it) before migrating", err=True)
+        raise typer.Exit(code=1)
+    moved = run(DatabaseService.migrate_messages_to_buckets)
+    typer.echo(f"Moved {moved} messages")
+
+@app.command()
+def compress_message_buckets(older_than_days: int = typer.Option(30, min=1)):
+    """Compress message buckets whose messages are all older than the given age"""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    compressed = run(lambda: DatabaseService.compress_message_buckets(cutoff))
+    typer.echo(f"Compressed {compressed} buckets")
+
+@app.command()
+def index_messages_for_search():
+    """Build the message search index from all stored messages"""
+    written = run(DatabaseService.index_messages_for_search)
+    typer.echo(f"Indexed {written} messages")
+
+if __name__ == "__main__":
+    app()
@@ -1,15 +1,23 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 import uuid
 
 class Match(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user1_id: str
     user2_id: str
+    pair_key: Optional[str] = None  # Sorted user IDs, unique per pair
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_message: Optional[str] = None  # Preview of the latest message
     last_message_at: Optional[datetime] = None
+    last_message_sender_id: Optional[str] = None
+    activity_at: Optional[datetime] = None  # Latest message or creation time, the inbox sort key
+    unread_counts: Dict[str, int] = {}  # recipient user ID -> unread messages
+    read_at: Dict[str, datetime] = {}  # user ID -> when they last read the conversation
+    last_read: Dict[str, dict] = {}  # user ID -> {"created_at", "id"} of the last message they read
     is_active: bool = True
+    updated_at: Optional[datetime] = None  # Any change to the match, the sync watermark
 
 class MatchResponse(BaseModel):
     id: str
@@ -19,4 +27,10 @@ class MatchResponse(BaseModel):
     last_message: Optional[str] = None
     last_message_at: Optional[datetime] = None
     created_at: datetime
-    unread_count: int = 0
\ No newline at end of file
+    unread_count: int = 0
+
+class MatchChange(MatchResponse):
+    is_active: bool
+    read_at: Optional[datetime] = None  # When the other user last read the conversation
+    read_up_to: Optional[str] = None  # ID of the last message the other user read
+    updated_at: datetime
@@ -10,13 +10,15 @@ class Message(BaseModel):
     receiver_id: str
     content: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    is_read: bool = False
 
 class MessageCreate(BaseModel):
     match_id: str
     receiver_id: str
     content: str
 
+class ReadReceipt(BaseModel):
+    up_to: Optional[str] = None  # Message ID read through; defaults to the latest message
+
 class MessageResponse(BaseModel):
     id: str
     match_id: str
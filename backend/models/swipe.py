@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 import uuid
 
 class SwipeAction(BaseModel):
@@ -14,9 +14,13 @@ class SwipeCreate(BaseModel):
     swiped_id: str
     action: str  # "like", "dislike", "super_like"
 
+class SwipeBatchCreate(BaseModel):
+    swipes: List[SwipeCreate] = Field(min_length=1, max_length=100)
+
 class SwipeResponse(BaseModel):
     id: str
     swiped_id: str
     action: str
     created_at: datetime
-    is_match: bool = False
\ No newline at end of file
+    is_match: bool = False
+    error: Optional[str] = None  # Set on batch items that were not recorded
\ No newline at end of file
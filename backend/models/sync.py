@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+from models.user import UserResponse
+from models.match import MatchChange
+from models.message import MessageResponse
+
+class SyncResponse(BaseModel):
+    watermark: datetime  # Pass back as `since` on the next sync
+    has_more: bool = False  # Sync again right away for the rest
+    user: Optional[UserResponse] = None  # Set only if the profile changed
+    matches: List[MatchChange] = []
+    messages: List[MessageResponse] = []
@@ -6,7 +6,12 @@ import uuid
 class UserPreferences(BaseModel):
     min_age: int = Field(default=18, ge=18, le=100)
     max_age: int = Field(default=35, ge=18, le=100)
-    max_distance: int = Field(default=25, ge=1, le=100)
+    max_distance: int = Field(default=25, ge=1, le=100)  # kilometers
+    min_shared_interests: int = Field(default=0, ge=0, le=10)
+
+class Location(BaseModel):
+    lat: float = Field(ge=-90, le=90)
+    lng: float = Field(ge=-180, le=180)
 
 class User(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -21,6 +26,7 @@ class User(BaseModel):
     interests: List[str] = []
     preferences: UserPreferences = Field(default_factory=UserPreferences)
     location: Optional[dict] = None  # {"lat": float, "lng": float}
+    geo: Optional[dict] = None  # GeoJSON point derived from location, 2dsphere indexed
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     is_active: bool = True
@@ -46,6 +52,7 @@ class UserUpdate(BaseModel):
     education: Optional[str] = None
     interests: Optional[List[str]] = None
     preferences: Optional[UserPreferences] = None
+    location: Optional[Location] = None
 
 class UserResponse(BaseModel):
     id: str
@@ -2,13 +2,18 @@ from fastapi import APIRouter, HTTPException, Depends, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 from models.user import UserCreate, UserLogin, UserResponse, User
-from services.auth import hash_password, verify_password, create_access_token, verify_token
-from services.database import DatabaseService
+from services.auth import create_access_token, verify_token, revoke_token, password_hasher, PasswordHasherBusy
+from services.database import DatabaseService, ID_PROJECTION
+from services.rate_limiting import rate_limit
+from services.user_cache import user_cache
 from datetime import datetime
 
 router = APIRouter()
 security = HTTPBearer()
 
+def hashing_busy() -> HTTPException:
+    return HTTPException(status_code=503, detail="Server busy, please try again", headers={"Retry-After": "1"})
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """Get current user from JWT token"""
     token = credentials.credentials
@@ -20,22 +25,28 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid token payload")
     
-    user = await DatabaseService.get_user_by_id(user_id)
+    # Served from a short-TTL cache; profile updates and deactivation invalidate it
+    user = await user_cache.get(user_id)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
+    if not user.get("is_active", True):
+        raise HTTPException(status_code=403, detail="Account is deactivated")
     
     return user
 
-@router.post("/signup", response_model=dict)
+@router.post("/signup", response_model=dict, dependencies=[Depends(rate_limit("signup"))])
 async def signup(user_data: UserCreate):
     """Register a new user"""
     # Check if user already exists
-    existing_user = await DatabaseService.get_user_by_email(user_data.email)
+    existing_user = await DatabaseService.get_user_by_email(user_data.email, projection=ID_PROJECTION)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    # Hash password
-    hashed_password = hash_password(user_data.password)
+    # Hash password off the event loop
+    try:
+        hashed_password = await password_hasher.hash(user_data.password)
+    except PasswordHasherBusy:
+        raise hashing_busy()
     
     # Create user object
     user = User(
@@ -50,8 +61,10 @@ async def signup(user_data: UserCreate):
         interests=[]
     )
     
-    # Save to database
+    # Save to database; the unique email index catches a concurrent signup that passed the check above
     created_user = await DatabaseService.create_user(user.dict())
+    if created_user is None:
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create access token
     access_token = create_access_token(data={"user_id": created_user["id"]})
@@ -74,7 +87,7 @@ async def signup(user_data: UserCreate):
         )
     }
 
-@router.post("/login", response_model=dict)
+@router.post("/login", response_model=dict, dependencies=[Depends(rate_limit("login"))])
 async def login(credentials: UserLogin):
     """Login user"""
     # Get user by email
@@ -82,10 +95,18 @@ async def login(credentials: UserLogin):
     if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    # Verify password
-    if not verify_password(credentials.password, user["password_hash"]):
+    # Verify password off the event loop
+    try:
+        valid, new_hash = await password_hasher.verify(credentials.password, user["password_hash"])
+    except PasswordHasherBusy:
+        raise hashing_busy()
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
+    # Move hashes from older schemes to the current KDF
+    if new_hash:
+        await DatabaseService.update_user(user["id"], {"password_hash": new_hash})
+    
     # Create access token
     access_token = create_access_token(data={"user_id": user["id"]})
     
@@ -107,6 +128,16 @@ async def login(credentials: UserLogin):
         )
     }
 
+@router.post("/logout", response_model=dict)
+async def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Revoke the current access token on every worker"""
+    payload = verify_token(credentials.credentials)
+    if payload is None:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    
+    await revoke_token(credentials.credentials, payload)
+    return {"message": "Logged out"}
+
 @router.get("/me", response_model=UserResponse)
 async def get_me(current_user: dict = Depends(get_current_user)):
     """Get current user profile"""
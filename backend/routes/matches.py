@@ -1,43 +1,65 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from typing import List, Optional
+from datetime import datetime
 from models.match import MatchResponse
 from services.database import DatabaseService
+from services.membership import match_membership
+from services.pagination import encode_cursor, decode_cursor
 from routes.auth import get_current_user
 
 router = APIRouter()
 
+MATCHES_PAGE_SIZE = 20
+MAX_MATCHES_PAGE_SIZE = 100
+
 @router.get("/", response_model=List[MatchResponse])
-async def get_matches(current_user: dict = Depends(get_current_user)):
-    """Get all matches for the current user"""
-    # Get matches from database
-    matches = await DatabaseService.get_user_matches(current_user["id"])
+async def get_matches(
+    response: Response,
+    limit: int = Query(MATCHES_PAGE_SIZE, ge=1, le=MAX_MATCHES_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get a page of matches for the current user, most recent activity first
+    
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    after = None
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+            after = {"activity_at": datetime.fromisoformat(position["a"]), "id": position["i"]}
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
     
-    # Convert to response format
-    match_responses = []
-    for match in matches:
-        # Determine the other user ID
-        other_user_id = match["user2_id"] if match["user1_id"] == current_user["id"] else match["user1_id"]
-        
-        # Get other user's profile
-        other_user = await DatabaseService.get_user_by_id(other_user_id)
-        if other_user:
-            # Get latest message for this match
-            messages = await DatabaseService.get_match_messages(match["id"])
-            last_message = messages[-1] if messages else None
-            
-            match_response = MatchResponse(
-                id=match["id"],
-                user_id=other_user["id"],
-                user_name=other_user["name"],
-                user_photo=other_user["photos"][0] if other_user["photos"] else None,
-                last_message=last_message["content"] if last_message else None,
-                last_message_at=last_message["created_at"] if last_message else None,
-                created_at=match["created_at"],
-                unread_count=0  # TODO: Implement unread count
-            )
-            match_responses.append(match_response)
+    # One aggregation returns each match with the other user's card and last message
+    summaries = await DatabaseService.get_match_summaries(current_user["id"], limit=limit, after=after)
     
-    # Sort by last message time (most recent first)
-    match_responses.sort(key=lambda x: x.last_message_at or x.created_at, reverse=True)
+    if len(summaries) == limit:
+        last = summaries[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor({"a": last["activity_at"].isoformat(), "i": last["id"]})
+    
+    # Convert to response format, skipping matches whose other user is gone
+    return [
+        MatchResponse(
+            id=summary["id"],
+            user_id=summary["user_id"],
+            user_name=summary["user_name"],
+            user_photo=summary.get("user_photo"),
+            last_message=summary.get("last_message"),
+            last_message_at=summary.get("last_message_at"),
+            created_at=summary["created_at"],
+            unread_count=summary.get("unread_count", 0)
+        )
+        for summary in summaries
+        if summary.get("user_id")
+    ]
+
+@router.delete("/{match_id}", response_model=dict)
+async def unmatch(match_id: str, current_user: dict = Depends(get_current_user)):
+    """Deactivate a match so neither user can message the other"""
+    match = await DatabaseService.deactivate_match(match_id, current_user["id"])
+    if match is None:
+        raise HTTPException(status_code=404, detail="Match not found")
     
-    return match_responses
\ No newline at end of file
+    match_membership.invalidate(match_id, (match["user1_id"], match["user2_id"]))
+    return {"match_id": match_id, "is_active": False}
@@ -1,12 +1,32 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-from models.message import MessageCreate, MessageResponse, Message
-from services.database import DatabaseService
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from typing import List, Optional
+import asyncio
+from models.message import MessageCreate, MessageResponse, Message, ReadReceipt
+from services.database import DatabaseService, message_is_read
+from services.membership import match_membership
+from services.realtime import realtime_hub
+from services.pagination import encode_cursor, decode_cursor
+from services.search import query_terms, rank
 from routes.auth import get_current_user
 from datetime import datetime
 
 router = APIRouter()
 
+MESSAGES_PAGE_SIZE = 50
+MAX_MESSAGES_PAGE_SIZE = 200
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 50
+
+def message_cursor(message: dict) -> str:
+    return encode_cursor({"t": message["created_at"].isoformat(), "i": message["id"]})
+
+def parse_message_cursor(cursor: str) -> dict:
+    try:
+        position = decode_cursor(cursor)
+        return {"created_at": datetime.fromisoformat(position["t"]), "id": position["i"]}
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.post("/send", response_model=MessageResponse)
 async def send_message(
     message_data: MessageCreate,
@@ -14,27 +34,23 @@ async def send_message(
 ):
     """Send a message to a matched user"""
     # Verify that the match exists and current user is part of it
-    matches = await DatabaseService.get_user_matches(current_user["id"])
-    match_exists = any(match["id"] == message_data.match_id for match in matches)
-    
-    if not match_exists:
+    other_user_id = await match_membership.get_other_user(current_user["id"], message_data.match_id)
+    if other_user_id is None:
         raise HTTPException(status_code=404, detail="Match not found")
     
     # Create message
     message = Message(
         match_id=message_data.match_id,
         sender_id=current_user["id"],
-        receiver_id=message_data.receiver_id,
+        receiver_id=other_user_id,
         content=message_data.content
     )
     
     created_message = await DatabaseService.create_message(message.dict())
     
-    # Update match's last message time
-    await DatabaseService.update_match_last_message(
-        message_data.match_id,
-        created_message["created_at"]
-    )
+    # Update the match's last-message summary
+    await DatabaseService.update_match_last_message(message_data.match_id, created_message)
+    realtime_hub.publish_message(created_message)
     
     return MessageResponse(
         id=created_message["id"],
@@ -43,25 +59,99 @@ async def send_message(
         receiver_id=created_message["receiver_id"],
         content=created_message["content"],
         created_at=created_message["created_at"],
-        is_read=created_message["is_read"],
+        is_read=False,
         is_current_user=True
     )
 
+@router.get("/search", response_model=List[MessageResponse])
+async def search_messages(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Search messages in the current user's active matches, best results first
+    
+    Messages rank by how many query terms they contain, then how often, then
+    recency. The cursor for the next page is returned in X-Next-Cursor.
+    """
+    after = None
+    if cursor:
+        try:
+            key = decode_cursor(cursor)["k"]
+            after = (int(key[0]), int(key[1]), float(key[2]), str(key[3]))
+        except (ValueError, KeyError, TypeError, IndexError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    terms = query_terms(q)
+    if not terms:
+        return []
+    
+    match_ids = await DatabaseService.get_active_match_ids(current_user["id"])
+    ranked = rank(await DatabaseService.search_messages(match_ids, terms), terms)
+    if after:
+        ranked = [item for item in ranked if item[0] > after]
+    page = ranked[:limit]
+    if len(ranked) > limit:
+        response.headers["X-Next-Cursor"] = encode_cursor({"k": list(page[-1][0])})
+    
+    read_positions = await DatabaseService.get_read_positions(list({message["match_id"] for _, message in page}))
+    return [
+        MessageResponse(
+            id=message["id"],
+            match_id=message["match_id"],
+            sender_id=message["sender_id"],
+            receiver_id=message["receiver_id"],
+            content=message["content"],
+            created_at=message["created_at"],
+            is_read=message_is_read(message, read_positions.get(message["match_id"], {}).get(message["receiver_id"])),
+            is_current_user=message["sender_id"] == current_user["id"]
+        )
+        for _, message in page
+    ]
+
 @router.get("/{match_id}", response_model=List[MessageResponse])
 async def get_messages(
     match_id: str,
+    response: Response,
+    limit: int = Query(MESSAGES_PAGE_SIZE, ge=1, le=MAX_MESSAGES_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get all messages for a specific match"""
-    # Verify that the match exists and current user is part of it
-    matches = await DatabaseService.get_user_matches(current_user["id"])
-    match_exists = any(match["id"] == match_id for match in matches)
+    """Get a page of messages for a specific match in chronological order
+    
+    Without a cursor the newest page is returned. X-Before-Cursor pages back
+    through older messages and X-After-Cursor fetches anything newer.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
     
-    if not match_exists:
+    # Verify that the match exists and current user is part of it
+    if await match_membership.get_other_user(current_user["id"], match_id) is None:
         raise HTTPException(status_code=404, detail="Match not found")
     
-    # Get messages
-    messages = await DatabaseService.get_match_messages(match_id)
+    # Get one page of messages and the participants' read watermarks
+    messages, read_positions = await asyncio.gather(
+        DatabaseService.get_match_messages(
+            match_id,
+            projection={"_id": 0},
+            limit=limit,
+            before=parse_message_cursor(before) if before else None,
+            after=parse_message_cursor(after) if after else None
+        ),
+        DatabaseService.get_read_positions([match_id])
+    )
+    read_positions = read_positions.get(match_id, {})
+    
+    if messages:
+        if not after and len(messages) == limit:
+            response.headers["X-Before-Cursor"] = message_cursor(messages[0])
+        response.headers["X-After-Cursor"] = message_cursor(messages[-1])
+    elif after:
+        # Nothing new yet; keep polling from the same position
+        response.headers["X-After-Cursor"] = after
     
     # Convert to response format
     message_responses = []
@@ -73,9 +163,34 @@ async def get_messages(
             receiver_id=message["receiver_id"],
             content=message["content"],
             created_at=message["created_at"],
-            is_read=message["is_read"],
+            is_read=message_is_read(message, read_positions.get(message["receiver_id"])),
             is_current_user=message["sender_id"] == current_user["id"]
         )
         message_responses.append(message_response)
     
-    return message_responses
\ No newline at end of file
+    return message_responses
+
+@router.post("/{match_id}/read", response_model=dict)
+async def mark_messages_read(
+    match_id: str,
+    receipt: Optional[ReadReceipt] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Mark messages in a match as read up to a message, or all of them
+    
+    Sends the other user a read receipt over the realtime hub.
+    """
+    # Verify that the match exists and current user is part of it
+    other_user_id = await match_membership.get_other_user(current_user["id"], match_id)
+    if other_user_id is None:
+        raise HTTPException(status_code=404, detail="Match not found")
+    
+    up_to = receipt.up_to if receipt else None
+    result = await DatabaseService.mark_match_read(match_id, current_user["id"], up_to)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Message not found")
+    
+    read_up_to, marked, unread_count = result
+    if marked:
+        realtime_hub.publish_read(match_id, current_user["id"], other_user_id, read_up_to)
+    return {"match_id": match_id, "marked_read": marked, "unread_count": unread_count}
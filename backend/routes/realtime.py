@@ -0,0 +1,31 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from services.auth import verify_token
+from services.user_cache import user_cache
+from services.realtime import realtime_hub
+
+router = APIRouter()
+
+@router.websocket("/ws")
+async def events(websocket: WebSocket, token: str):
+    """Stream new matches and messages to the user as JSON events
+    
+    Browsers cannot set headers on WebSockets, so the JWT comes in the token
+    query parameter. Send "ping" to keep idle connections open.
+    """
+    payload = verify_token(token)
+    user_id = payload.get("user_id") if payload else None
+    user = await user_cache.get(user_id) if user_id else None
+    if user is None or not user.get("is_active", True):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    realtime_hub.connect(user_id, websocket)
+    try:
+        while True:
+            if await websocket.receive_text() == "ping":
+                await websocket.send_text("pong")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        realtime_hub.disconnect(user_id, websocket)
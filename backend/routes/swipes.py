@@ -1,55 +1,76 @@
-from fastapi import APIRouter, HTTPException, Depends
-from models.swipe import SwipeCreate, SwipeResponse, SwipeAction
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Request
+from typing import List
+from models.swipe import SwipeCreate, SwipeBatchCreate, SwipeResponse, SwipeAction
 from models.match import Match
-from services.database import DatabaseService
+from services.database import DatabaseService, ID_PROJECTION
+from services.deck import discovery_decks
+from services.rate_limiting import rate_limit, charge
+from services.realtime import realtime_hub
+from services.swipe_filter import swipe_filters
+from services.swipe_ingest import record_swipes, swipe_buffer
 from routes.auth import get_current_user
 from datetime import datetime
 
 router = APIRouter()
 
-@router.post("/swipe", response_model=SwipeResponse)
+async def create_match_if_mutual(swiper_id: str, swiped_id: str, action: str) -> bool:
+    """Create a match if the swiped user already liked the swiper"""
+    if action != "like":
+        return False
+    
+    # Our swipe is already stored, so of two concurrent likes at least one sees the other
+    if not await DatabaseService.has_liked(swiped_id, swiper_id):
+        return False
+    
+    match = Match(user1_id=swiper_id, user2_id=swiped_id).dict()
+    # Only the request that created the match announces it
+    if await DatabaseService.create_match(match):
+        realtime_hub.publish_match(match)
+    return True
+
+@router.post("/swipe", response_model=SwipeResponse, dependencies=[Depends(rate_limit("swipe"))])
 async def swipe_user(
     swipe_data: SwipeCreate,
     current_user: dict = Depends(get_current_user)
 ):
-    """Swipe on a user (like, dislike, or super_like)"""
-    # Check if user exists
-    target_user = await DatabaseService.get_user_by_id(swipe_data.swiped_id)
-    if not target_user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Check if user already swiped on this person
-    existing_swipe = await DatabaseService.get_swipe(
-        current_user["id"], 
-        swipe_data.swiped_id
-    )
-    if existing_swipe:
-        raise HTTPException(status_code=400, detail="Already swiped on this user")
+    """Swipe on a user (like, dislike, or super_like)
     
-    # Create swipe record
+    In write-behind mode the swipe is acknowledged once queued and is_match is
+    always False; matches are detected when the buffer is flushed.
+    """
     swipe = SwipeAction(
         swiper_id=current_user["id"],
         swiped_id=swipe_data.swiped_id,
         action=swipe_data.action
     )
     
-    created_swipe = await DatabaseService.create_swipe(swipe.dict())
-    
-    # Check for mutual like (match)
-    is_match = False
-    if swipe_data.action == "like":
-        is_match = await DatabaseService.check_mutual_like(
-            current_user["id"],
-            swipe_data.swiped_id
+    if swipe_buffer.offer(swipe):
+        discovery_decks.consume(current_user, swipe_data.swiped_id)
+        return SwipeResponse(
+            id=swipe.id,
+            swiped_id=swipe.swiped_id,
+            action=swipe.action,
+            created_at=swipe.created_at
         )
-        
-        # Create match if mutual like
-        if is_match:
-            match = Match(
-                user1_id=current_user["id"],
-                user2_id=swipe_data.swiped_id
-            )
-            await DatabaseService.create_match(match.dict())
+    
+    # Check the target is active while inserting, as record_swipes does; the unique index rejects repeat swipes
+    target_user, created_swipe = await asyncio.gather(
+        DatabaseService.get_active_user_by_id(swipe_data.swiped_id, projection=ID_PROJECTION),
+        DatabaseService.create_swipe(swipe.dict())
+    )
+    if not target_user:
+        if created_swipe:
+            await DatabaseService.delete_swipe(created_swipe["id"])
+        raise HTTPException(status_code=404, detail="User not found")
+    if created_swipe is None:
+        raise HTTPException(status_code=400, detail="Already swiped on this user")
+    
+    discovery_decks.consume(current_user, swipe_data.swiped_id)
+    is_match, _ = await asyncio.gather(
+        create_match_if_mutual(current_user["id"], swipe_data.swiped_id, swipe_data.action),
+        swipe_filters.add(current_user["id"], swipe_data.swiped_id)
+    )
     
     return SwipeResponse(
         id=created_swipe["id"],
@@ -57,4 +78,39 @@ async def swipe_user(
         action=created_swipe["action"],
         created_at=created_swipe["created_at"],
         is_match=is_match
-    )
\ No newline at end of file
+    )
+
+@router.post("/batch", response_model=List[SwipeResponse], dependencies=[Depends(rate_limit("swipe_batch"))])
+async def swipe_users_batch(
+    batch: SwipeBatchCreate,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """Record many swipes at once, e.g. replayed from an offline queue
+    
+    Items that cannot be recorded are returned with `error` set instead of
+    failing the whole batch.
+    """
+    # Every swipe in the batch counts against the single-swipe limits
+    charge("swipe", request, cost=len(batch.swipes))
+    swipes = [
+        SwipeAction(swiper_id=current_user["id"], swiped_id=item.swiped_id, action=item.action)
+        for item in batch.swipes
+    ]
+    outcomes = await record_swipes(swipes)
+    
+    for swipe, outcome in zip(swipes, outcomes):
+        if outcome.error is None:
+            discovery_decks.consume(current_user, swipe.swiped_id)
+    
+    return [
+        SwipeResponse(
+            id=swipe.id,
+            swiped_id=swipe.swiped_id,
+            action=swipe.action,
+            created_at=swipe.created_at,
+            is_match=outcome.is_match,
+            error=outcome.error
+        )
+        for swipe, outcome in zip(swipes, outcomes)
+    ]
@@ -0,0 +1,102 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+from datetime import datetime, timedelta, timezone
+from models.sync import SyncResponse
+from models.user import UserResponse
+from models.match import MatchChange
+from models.message import MessageResponse
+from services.database import DatabaseService, message_is_read
+from routes.auth import get_current_user
+
+router = APIRouter()
+
+SYNC_PAGE_SIZE = 500
+# Writes stamped by other workers just before a sync may commit just after it
+CLOCK_SKEW = timedelta(seconds=2)
+
+@router.get("/", response_model=SyncResponse)
+async def sync(
+    since: Optional[datetime] = None,
+    limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=SYNC_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get everything that changed since a watermark in one request
+    
+    Returns the profile if it changed, matches created, updated, read or
+    unmatched, and messages sent or received. A match's read_at tells when
+    the other user last read the conversation. Watermarks are inclusive, so
+    items may repeat across syncs and should be applied by id. Without
+    `since`, everything is returned in pages flagged by has_more.
+    """
+    if since is not None and since.tzinfo is not None:
+        # Stored timestamps are naive UTC
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    user_id = current_user["id"]
+    watermark = datetime.utcnow() - CLOCK_SKEW
+    
+    matches = await DatabaseService.get_match_changes(user_id, since, limit)
+    messages = await DatabaseService.get_messages_since(user_id, since, limit, projection={"_id": 0})
+    
+    # A full page may hide more changes; resume from the earliest page end
+    has_more = False
+    if len(matches) == limit:
+        has_more = True
+        watermark = min(watermark, matches[-1].get("updated_at") or matches[-1]["created_at"])
+    if len(messages) == limit:
+        has_more = True
+        watermark = min(watermark, messages[-1]["created_at"])
+    
+    read_positions = await DatabaseService.get_read_positions(list({message["match_id"] for message in messages}))
+    
+    user = None
+    if since is None or current_user["updated_at"] >= since:
+        user = UserResponse(
+            id=current_user["id"],
+            email=current_user["email"],
+            name=current_user["name"],
+            age=current_user["age"],
+            bio=current_user["bio"],
+            photos=current_user["photos"],
+            occupation=current_user["occupation"],
+            education=current_user["education"],
+            interests=current_user["interests"],
+            preferences=current_user["preferences"],
+            created_at=current_user["created_at"]
+        )
+    
+    return SyncResponse(
+        watermark=watermark,
+        has_more=has_more,
+        user=user,
+        matches=[
+            MatchChange(
+                id=match["id"],
+                user_id=match["user_id"],
+                user_name=match["user_name"],
+                user_photo=match.get("user_photo"),
+                last_message=match.get("last_message"),
+                last_message_at=match.get("last_message_at"),
+                created_at=match["created_at"],
+                unread_count=match.get("unread_count", 0),
+                is_active=match["is_active"],
+                read_at=(match.get("read_at") or {}).get(match["user_id"]),
+                read_up_to=((match.get("last_read") or {}).get(match["user_id"]) or {}).get("id"),
+                updated_at=match.get("updated_at") or match["created_at"]
+            )
+            for match in matches
+            if match.get("user_id")
+        ],
+        messages=[
+            MessageResponse(
+                id=message["id"],
+                match_id=message["match_id"],
+                sender_id=message["sender_id"],
+                receiver_id=message["receiver_id"],
+                content=message["content"],
+                created_at=message["created_at"],
+                is_read=message_is_read(message, read_positions.get(message["match_id"], {}).get(message["receiver_id"])),
+                is_current_user=message["sender_id"] == user_id
+            )
+            for message in messages
+        ]
+    )
@@ -1,12 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from typing import List, Optional
 from models.user import UserUpdate, UserResponse, UserProfile
-from services.database import DatabaseService
+from services.database import DatabaseService, PROFILE_PROJECTION
+from services.deck import discovery_decks
+from services.interest_index import interest_index
+from services.geo import to_geo_point, distance_km, round_distance
+from services.pagination import encode_cursor, decode_cursor
+from services.user_cache import user_cache
 from routes.auth import get_current_user
 from datetime import datetime
 
 router = APIRouter()
 
+DISCOVER_PAGE_SIZE = 10
+MAX_DISCOVER_PAGE_SIZE = 50
+
 @router.put("/profile", response_model=UserResponse)
 async def update_profile(
     update_data: UserUpdate,
@@ -29,6 +37,9 @@ async def update_profile(
         update_fields["interests"] = update_data.interests
     if update_data.preferences is not None:
         update_fields["preferences"] = update_data.preferences.dict()
+    if update_data.location is not None:
+        update_fields["location"] = update_data.location.dict()
+        update_fields["geo"] = to_geo_point(update_fields["location"])
     
     update_fields["updated_at"] = datetime.utcnow()
     
@@ -37,8 +48,16 @@ async def update_profile(
     if not success:
         raise HTTPException(status_code=400, detail="Failed to update profile")
     
-    # Get updated user
-    updated_user = await DatabaseService.get_user_by_id(current_user["id"])
+    if update_data.interests is not None:
+        interest_index.update(current_user["id"], update_data.interests)
+    
+    # Discovery candidates and their ranking depend on these fields
+    if {"age", "interests", "preferences", "location"} & update_fields.keys():
+        discovery_decks.reset(current_user["id"])
+    
+    # Get updated user, refreshing the cached copy
+    user_cache.invalidate(current_user["id"])
+    updated_user = await user_cache.get(current_user["id"])
     
     return UserResponse(
         id=updated_user["id"],
@@ -54,22 +73,58 @@ async def update_profile(
         created_at=updated_user["created_at"]
     )
 
+@router.delete("/me", response_model=dict)
+async def deactivate_account(current_user: dict = Depends(get_current_user)):
+    """Deactivate the current user's account, hiding them from discovery and rejecting their token"""
+    await DatabaseService.update_user(current_user["id"], {"is_active": False, "updated_at": datetime.utcnow()})
+    user_cache.invalidate(current_user["id"])
+    interest_index.remove(current_user["id"])
+    discovery_decks.reset(current_user["id"])
+    return {"is_active": False}
+
 @router.get("/discover", response_model=List[UserProfile])
-async def discover_users(current_user: dict = Depends(get_current_user)):
-    """Get potential matches for the current user"""
-    # Get users the current user has already swiped on
-    swiped_user_ids = await DatabaseService.get_user_swipes(current_user["id"])
+async def discover_users(
+    response: Response,
+    limit: int = Query(DISCOVER_PAGE_SIZE, ge=1, le=MAX_DISCOVER_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get a page of potential matches for the current user
     
-    # Get potential matches
-    potential_matches = await DatabaseService.get_potential_matches(
-        current_user["id"],
-        current_user["preferences"],
-        swiped_user_ids
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    It also carries the deck's scan position, so any worker can resume it.
+    """
+    after_seq = generation = resume_after = None
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+            after_seq, generation, resume_after = int(position["s"]), position["g"], position["p"]
+            if resume_after is not None and not isinstance(resume_after, dict):
+                raise ValueError("Invalid cursor")
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    # Read the next candidates from the user's prepared deck
+    entries, generation = await discovery_decks.peek(current_user, limit, after_seq, generation, resume_after)
+    users = await DatabaseService.get_users_by_ids(
+        [entry.candidate_id for entry in entries],
+        projection=PROFILE_PROJECTION
     )
+    users_by_id = {user["id"]: user for user in users}
+    
+    if len(entries) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor({
+            "g": generation,
+            "s": entries[-1].seq,
+            "p": entries[-1].resume_after
+        })
     
-    # Convert to UserProfile format
+    # Convert to UserProfile format, keeping the deck's ranking
     profiles = []
-    for user in potential_matches:
+    for entry in entries:
+        user = users_by_id.get(entry.candidate_id)
+        if user is None:
+            continue
         profile = UserProfile(
             id=user["id"],
             name=user["name"],
@@ -79,7 +134,7 @@ async def discover_users(current_user: dict = Depends(get_current_user)):
             occupation=user["occupation"],
             education=user["education"],
             interests=user["interests"],
-            distance=2  # Mock distance for now
+            distance=round_distance(entry.distance)
         )
         profiles.append(profile)
     
@@ -88,7 +143,7 @@ async def discover_users(current_user: dict = Depends(get_current_user)):
 @router.get("/profile/{user_id}", response_model=UserProfile)
 async def get_user_profile(user_id: str, current_user: dict = Depends(get_current_user)):
     """Get a specific user's profile"""
-    user = await DatabaseService.get_user_by_id(user_id)
+    user = await DatabaseService.get_user_by_id(user_id, projection=PROFILE_PROJECTION)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -101,5 +156,5 @@ async def get_user_profile(user_id: str, current_user: dict = Depends(get_curren
         occupation=user["occupation"],
         education=user["education"],
         interests=user["interests"],
-        distance=2  # Mock distance for now
+        distance=round_distance(distance_km(current_user.get("geo"), user.get("geo")))
     )
\ No newline at end of file
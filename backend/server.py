@@ -1,12 +1,84 @@
-from fastapi import FastAPI
+import logging
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 
+from services.database import init_database, DatabaseService
+from services.indexes import ensure_indexes, log_index_report
+from services.auth import password_hasher
+from services.deck import discovery_decks
+from services import rate_limiting
+from services.interest_index import interest_index
+from services.realtime import realtime_hub, LocalBroker, MongoBroker
+from services.swipe_ingest import swipe_buffer
+from services.token_revocation import token_revocations
+from services.user_cache import user_cache
+from routes import auth, users, swipes, matches, messages, realtime, sync
+
+ROOT_DIR = Path(__file__).parent
+logger = logging.getLogger(__name__)
+load_dotenv(ROOT_DIR / '.env')
+
+# Database
+init_database(os.environ['MONGO_URL'], os.environ['DB_NAME'], os.environ.get('MESSAGE_STORAGE', 'documents'))
+
 app = FastAPI(title="Mer - Dating App API")
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Mer API"}
 
+# API routes
+api_router = APIRouter(prefix="/api")
+
+@api_router.get("/")
+async def api_root():
+    return {"message": "Welcome to the Mer API"}
+
+api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
+api_router.include_router(users.router, prefix="/users", tags=["users"])
+api_router.include_router(swipes.router, prefix="/swipes", tags=["swipes"])
+api_router.include_router(matches.router, prefix="/matches", tags=["matches"])
+api_router.include_router(messages.router, prefix="/messages", tags=["messages"])
+api_router.include_router(sync.router, prefix="/sync", tags=["sync"])
+api_router.include_router(realtime.router, prefix="/realtime", tags=["realtime"])
+app.include_router(api_router)
+
+@app.on_event("startup")
+async def startup():
+    rate_limiting.enabled = os.environ.get('RATE_LIMITING', '1') == '1'
+    # Behind an ingress every peer is the proxy; trust its X-Forwarded-For instead
+    rate_limiting.trusted_proxies = rate_limiting.parse_networks(os.environ.get('TRUSTED_PROXIES', ''))
+    await ensure_indexes()
+    # Matches from before activity_at existed would fall out of the index-ordered match list
+    await DatabaseService.backfill_activity_at()
+    await log_index_report()
+    await interest_index.start()
+    await token_revocations.start()
+    # Share events across uvicorn workers through MongoDB; "local" suits a single worker
+    if os.environ.get('EVENT_BROKER', 'local') == 'mongo':
+        await realtime_hub.start(MongoBroker())
+    else:
+        await realtime_hub.start(LocalBroker())
+    if os.environ.get('SWIPE_WRITE_BEHIND') == '1':
+        await swipe_buffer.start(
+            flush_interval=float(os.environ.get('SWIPE_FLUSH_INTERVAL', '0.05')),
+            max_batch=int(os.environ.get('SWIPE_MAX_BATCH', '500'))
+        )
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Flush buffered swipes before anything they depend on goes away
+    await swipe_buffer.close()
+    await discovery_decks.close()
+    await interest_index.close()
+    await token_revocations.close()
+    password_hasher.close()
+    await realtime_hub.close()
+    logger.info("User cache: %s", user_cache.stats())
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -14,4 +86,5 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Before-Cursor", "X-After-Cursor"],
 )
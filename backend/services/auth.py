@@ -1,20 +1,70 @@
+import asyncio
 import hashlib
+import os
 import secrets
+import time
 import jwt
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
+from passlib.context import CryptContext
+from services.token_revocation import token_revocations
+from services.ttl_cache import TTLCache
 
 SECRET_KEY = "your-secret-key-here"  # In production, use environment variable
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
+VERIFIED_TOKEN_CACHE_SIZE = 10000
+HASH_WORKERS = min(4, os.cpu_count() or 1)
+MAX_PENDING_HASHES = 64  # Hashes running or queued before requests are turned away
+
+# PBKDF2 runs in hashlib with the GIL released, so a thread pool hashes in parallel.
+# Unsalted SHA-256 hex digests from before are still accepted and upgraded on login.
+pwd_context = CryptContext(schemes=["pbkdf2_sha256", "hex_sha256"], deprecated=["hex_sha256"])
 
 def hash_password(password: str) -> str:
-    """Hash a password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash a password with the current KDF"""
+    return pwd_context.hash(password)
+
+def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password against its hash, also returning a replacement hash if it uses an old scheme"""
+    return pwd_context.verify_and_update(password, hashed_password)
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashes are already running or queued"""
 
-def verify_password(password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash"""
-    return hash_password(password) == hashed_password
+class PasswordHasher:
+    """Runs password hashing on a dedicated thread pool, off the event loop, with bounded queueing"""
+    
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = MAX_PENDING_HASHES):
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+    
+    async def _run(self, function, *args):
+        # Checked and counted on the event loop thread, so no lock is needed
+        if self.pending >= self.max_pending:
+            raise PasswordHasherBusy()
+        self.pending += 1
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(function, *args)
+        # Released when the pool is done with the hash, not when a cancelled caller stops waiting
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        return await asyncio.wrap_future(future)
+    
+    def _release(self):
+        self.pending -= 1
+    
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+    
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._run(verify_password, password, hashed_password)
+    
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+password_hasher = PasswordHasher()
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
@@ -27,10 +77,34 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Verified token digests -> payload until the token's exp, so repeat requests skip signature checks
+verified_tokens: TTLCache[dict] = TTLCache(VERIFIED_TOKEN_CACHE_SIZE, clock=time.time)
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
 def verify_token(token: str) -> Optional[dict]:
-    """Verify and decode a JWT token"""
+    """Verify and decode a JWT token, returning None if it is invalid, expired or revoked"""
+    digest = token_digest(token)
+    if token_revocations.is_revoked(digest):
+        verified_tokens.discard(digest)
+        return None
+    
+    payload = verified_tokens.get(digest)
+    if payload is not None:
+        return payload
+    
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except jwt.PyJWTError:
-        return None
\ No newline at end of file
+        return None
+    # Tokens without an expiry are never cached
+    if isinstance(payload.get("exp"), (int, float)):
+        verified_tokens.put(digest, payload, expires_at=payload["exp"])
+    return payload
+
+async def revoke_token(token: str, payload: dict):
+    """Reject a verified token on every worker until it expires"""
+    digest = token_digest(token)
+    verified_tokens.discard(digest)
+    await token_revocations.revoke(digest, datetime.utcfromtimestamp(payload["exp"]))
\ No newline at end of file
@@ -1,15 +1,142 @@
+import asyncio
+import operator
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional, List, Dict, Any
+from pymongo import ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Callable, Container, Iterable, Tuple
+from services import message_buckets, search
+from services.geo import distance_km, EARTH_RADIUS_KM
 
 # Database will be initialized by server.py
 client = None
 db = None
+message_storage = "documents"  # or "buckets"
 
-def init_database(mongo_url: str, db_name: str):
-    """Initialize database connection"""
-    global client, db
+# Upper bound on candidates streamed per discovery query when swiped users are filtered client-side
+MAX_CANDIDATE_SCAN = 2000
+
+# Characters of the latest message kept on the match for the match list
+LAST_MESSAGE_PREVIEW_LENGTH = 200
+READ_RETRIES = 3  # Attempts to advance a read watermark under concurrent reads
+MAX_SEARCH_CANDIDATES = 1000  # Most recent matching messages ranked per search
+SEARCH_INDEX_BATCH = 1000
+
+# Lean projections for hot paths; leaving out _id also skips its str() conversion
+ID_PROJECTION = {"_id": 0, "id": 1}
+AUTH_USER_PROJECTION = {"_id": 0, "password_hash": 0}
+PROFILE_PROJECTION = {
+    "_id": 0, "id": 1, "name": 1, "age": 1, "bio": 1, "photos": 1,
+    "occupation": 1, "education": 1, "interests": 1, "geo": 1
+}
+CANDIDATE_PROJECTION = {
+    "_id": 0, "id": 1, "age": 1, "interests": 1, "geo": 1,
+    "distance": 1, "created_at": 1, "updated_at": 1
+}
+
+def init_database(mongo_url: str, db_name: str, storage: str = "documents"):
+    """Initialize database connection
+    
+    storage "buckets" packs new messages into per-match bucket documents;
+    reads also cover messages still stored one per document.
+    """
+    global client, db, message_storage
     client = AsyncIOMotorClient(mongo_url)
     db = client[db_name]
+    message_storage = storage
+
+def _stringify_id(document: Optional[dict]) -> Optional[dict]:
+    """Convert a document's ObjectId to str when _id was not projected away"""
+    if document and "_id" in document:
+        document["_id"] = str(document["_id"])
+    return document
+
+def match_pair_key(user1_id: str, user2_id: str) -> str:
+    """Order-independent key identifying the match between two users"""
+    return ":".join(sorted((user1_id, user2_id)))
+
+def _message_keyset(op: str, position: dict) -> dict:
+    """Filter for messages before/after a {"created_at", "id"} position in (created_at, id) order"""
+    return {"$or": [
+        {"created_at": {op: position["created_at"]}},
+        {"created_at": position["created_at"], "id": {op: position["id"]}}
+    ]}
+
+def _message_order(message: dict) -> tuple:
+    return (message["created_at"], message["id"])
+
+_KEYSET_OPERATORS = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+
+def _in_keyset(op: str, position: dict) -> Callable[[dict], bool]:
+    """Python counterpart of _message_keyset for messages read out of buckets"""
+    compare = _KEYSET_OPERATORS[op]
+    return lambda message: compare(_message_order(message), _message_order(position))
+
+def _merge_messages(*message_lists: Iterable[dict], descending: bool = False, limit: Optional[int] = None) -> List[dict]:
+    """Merge message lists in (created_at, id) order, dropping duplicates seen mid-migration"""
+    by_id = {}
+    for messages in message_lists:
+        for message in messages:
+            by_id.setdefault(message["id"], message)
+    merged = sorted(by_id.values(), key=_message_order, reverse=descending)
+    return merged if limit is None else merged[:limit]
+
+def message_is_read(message: dict, read_position: Optional[dict]) -> bool:
+    """Whether a message's receiver has read it, given their read watermark on the match"""
+    if message.get("is_read"):
+        # Read before watermarks replaced per-message flags
+        return True
+    if read_position is None:
+        return False
+    return (message["created_at"], message["id"]) <= (read_position["created_at"], read_position["id"])
+
+def _geo_near(origin: dict, user_preferences: dict, query: dict) -> dict:
+    """$geoNear stage that filters by radius on the server and adds the distance in km"""
+    return {
+        "near": origin,
+        "key": "geo",
+        "distanceField": "distance",
+        "maxDistance": user_preferences.get("max_distance", 25) * 1000,
+        "distanceMultiplier": 0.001,
+        "spherical": True,
+        "query": query
+    }
+
+def _join_other_user(user_id: str, fields: Dict[str, Any]) -> List[dict]:
+    """Stages adding the other participant's card and the user's unread count to matches
+    
+    Matches whose other user no longer exists are kept without user_id, so
+    a page cut by an earlier $limit is never shortened.
+    """
+    return [
+        {"$addFields": {
+            "other_user_id": {"$cond": [{"$eq": ["$user1_id", user_id]}, "$user2_id", "$user1_id"]}
+        }},
+        {"$lookup": {
+            "from": "users",
+            "localField": "other_user_id",
+            "foreignField": "id",
+            "as": "other_user"
+        }},
+        {"$unwind": {"path": "$other_user", "preserveNullAndEmptyArrays": True}},
+        {"$project": {
+            "_id": 0,
+            **fields,
+            "unread_count": {"$ifNull": [f"$unread_counts.{user_id}", 0]},
+            "user_id": "$other_user.id",
+            "user_name": "$other_user.name",
+            "user_photo": {"$arrayElemAt": ["$other_user.photos", 0]}
+        }}
+    ]
+
+def _prepare_match(match_data: dict) -> dict:
+    """Fill in the derived fields a new match document needs"""
+    match_data["pair_key"] = match_pair_key(match_data["user1_id"], match_data["user2_id"])
+    if match_data.get("activity_at") is None:
+        match_data["activity_at"] = match_data["created_at"]
+    if match_data.get("updated_at") is None:
+        match_data["updated_at"] = match_data["created_at"]
+    return match_data
 
 # Collections
 def get_users_collection():
@@ -24,29 +151,146 @@ def get_matches_collection():
 def get_messages_collection():
     return db.messages
 
+def get_message_buckets_collection():
+    return db.message_buckets
+
+def get_message_search_collection():
+    return db.message_search
+
+def get_revoked_tokens_collection():
+    return db.revoked_tokens
+
+def _search_document(message: dict) -> dict:
+    """Inverted-index entry for a message: its terms plus what a search result shows"""
+    document = {
+        field: message[field]
+        for field in ("id", "match_id", "sender_id", "receiver_id", "content", "created_at")
+    }
+    document["terms"] = search.index_terms(message["content"])
+    return document
+
+async def _index_for_search(message: dict):
+    document = _search_document(message)
+    if document["terms"]:
+        await get_message_search_collection().insert_one(document)
+
+async def _read_buckets(
+    query: dict,
+    keep: Callable[[dict], bool],
+    descending: bool = False,
+    limit: Optional[int] = None
+) -> List[dict]:
+    """Messages from the buckets matching query that pass keep, in (created_at, id) order
+    
+    Buckets are streamed latest end first when descending, earliest start
+    first otherwise, and reading stops once no further bucket can hold one
+    of the first `limit` messages.
+    """
+    sort = [("end", -1)] if descending else [("start", 1)]
+    found: List[dict] = []
+    async for bucket in get_message_buckets_collection().find(query).sort(sort):
+        if limit is not None and len(found) >= limit:
+            found.sort(key=_message_order, reverse=descending)
+            del found[limit:]
+            boundary = found[-1]["created_at"]
+            if (bucket["end"] < boundary) if descending else (bucket["start"] > boundary):
+                break
+        found.extend(message for message in message_buckets.unpack(bucket) if keep(message))
+    found.sort(key=_message_order, reverse=descending)
+    return found if limit is None else found[:limit]
+
+async def _find_message(match_id: str, message_id: Optional[str] = None) -> Optional[dict]:
+    """A message in a match by ID, or the match's latest message"""
+    projection = {"_id": 0, "id": 1, "created_at": 1}
+    if message_id is None:
+        message = await get_messages_collection().find_one(
+            {"match_id": match_id}, projection, sort=[("created_at", -1), ("id", -1)]
+        )
+    else:
+        message = await get_messages_collection().find_one({"match_id": match_id, "id": message_id}, projection)
+    if message_storage != "buckets" or (message_id and message):
+        return message
+    
+    if message_id is None:
+        latest = await _read_buckets({"match_id": match_id}, lambda message: True, descending=True, limit=1)
+        merged = _merge_messages([message] if message else [], latest, descending=True, limit=1)
+        return merged[0] if merged else None
+    
+    # Open buckets are searched by message ID; compressed ones have to be unpacked
+    async for bucket in get_message_buckets_collection().find(
+        {"match_id": match_id, "$or": [{"messages.id": message_id}, {"compressed": True}]}
+    ).sort([("end", -1)]):
+        for message in message_buckets.unpack(bucket):
+            if message["id"] == message_id:
+                return message
+    return None
+
+async def _count_received(match_id: str, user_id: str, after: Optional[dict] = None, through: Optional[dict] = None) -> int:
+    """Count unread-flagged messages a user received in a match after one position and up to another"""
+    query: Dict[str, Any] = {"match_id": match_id, "receiver_id": user_id, "is_read": {"$ne": True}}
+    conditions = []
+    if through:
+        conditions.append(_message_keyset("$lte", through))
+    if after:
+        conditions.append(_message_keyset("$gt", after))
+    if conditions:
+        query["$and"] = conditions
+    count = await get_messages_collection().count_documents(query)
+    
+    if message_storage == "buckets":
+        bucket_query: Dict[str, Any] = {"match_id": match_id}
+        tests = [lambda message: message["receiver_id"] == user_id and not message.get("is_read")]
+        if through:
+            bucket_query["start"] = {"$lte": through["created_at"]}
+            tests.append(_in_keyset("$lte", through))
+        if after:
+            bucket_query["end"] = {"$gte": after["created_at"]}
+            tests.append(_in_keyset("$gt", after))
+        count += len(await _read_buckets(bucket_query, lambda message: all(test(message) for test in tests)))
+    return count
+
+def get_swipe_filters_collection():
+    return db.swipe_filters
+
 class DatabaseService:
     @staticmethod
-    async def create_user(user_data: dict) -> dict:
-        """Create a new user"""
-        result = await get_users_collection().insert_one(user_data)
+    async def create_user(user_data: dict) -> Optional[dict]:
+        """Create a new user, or return None if the email is already registered"""
+        try:
+            result = await get_users_collection().insert_one(user_data)
+        except DuplicateKeyError:
+            return None
         user_data['_id'] = str(result.inserted_id)
         return user_data
     
     @staticmethod
-    async def get_user_by_email(email: str) -> Optional[dict]:
+    async def get_user_by_email(email: str, projection: Optional[dict] = None) -> Optional[dict]:
         """Get user by email"""
-        user = await get_users_collection().find_one({"email": email})
-        if user:
-            user['_id'] = str(user['_id'])
-        return user
+        user = await get_users_collection().find_one({"email": email}, projection)
+        return _stringify_id(user)
     
     @staticmethod
-    async def get_user_by_id(user_id: str) -> Optional[dict]:
+    async def get_user_by_id(user_id: str, projection: Optional[dict] = None) -> Optional[dict]:
         """Get user by ID"""
-        user = await get_users_collection().find_one({"id": user_id})
-        if user:
-            user['_id'] = str(user['_id'])
-        return user
+        user = await get_users_collection().find_one({"id": user_id}, projection)
+        return _stringify_id(user)
+    
+    @staticmethod
+    async def get_active_user_by_id(user_id: str, projection: Optional[dict] = None) -> Optional[dict]:
+        """Get a user by ID unless their account is deactivated"""
+        user = await get_users_collection().find_one({"id": user_id, "is_active": True}, projection)
+        return _stringify_id(user)
+    
+    @staticmethod
+    async def get_users_by_ids(user_ids: List[str], projection: Optional[dict] = None) -> List[dict]:
+        """Get active users by ID in a single query"""
+        users = await get_users_collection().find({
+            "id": {"$in": user_ids},
+            "is_active": True
+        }, projection).to_list(length=len(user_ids))
+        for user in users:
+            _stringify_id(user)
+        return users
     
     @staticmethod
     async def update_user(user_id: str, update_data: dict) -> bool:
@@ -58,107 +302,673 @@ class DatabaseService:
         return result.modified_count > 0
     
     @staticmethod
-    async def get_potential_matches(user_id: str, user_preferences: dict, swiped_user_ids: List[str]) -> List[dict]:
-        """Get potential matches for a user"""
+    async def get_potential_matches(
+        user_id: str,
+        user_preferences: dict,
+        exclude_ids: List[str],
+        origin: Optional[dict] = None,
+        limit: int = 10,
+        swipe_filter: Optional[Container[str]] = None,
+        after: Optional[dict] = None,
+        projection: Optional[dict] = None
+    ) -> Tuple[List[dict], Optional[dict]]:
+        """Get potential matches for a user, ordered by (distance, id) or by id
+        
+        Candidates in swipe_filter are skipped while streaming results, so a
+        user's swipe history never has to be sent to Mongo as a $nin list.
+        `after` is the {"distance", "id"} keyset position of the last candidate
+        already seen; scanning resumes right after it.
+        
+        Also returns the keyset position of the last user scanned, including
+        filtered ones, so the next call can resume past them. It is None once
+        the pool itself has run out.
+        """
         query = {
-            "id": {"$ne": user_id},
-            "id": {"$nin": swiped_user_ids},
+            "id": {"$nin": exclude_ids + [user_id]},
             "age": {
                 "$gte": user_preferences.get("min_age", 18),
                 "$lte": user_preferences.get("max_age", 35)
             },
             "is_active": True
         }
+        scan_limit = limit if swipe_filter is None else MAX_CANDIDATE_SCAN
         
-        users = await get_users_collection().find(query).limit(10).to_list(length=10)
-        for user in users:
-            user['_id'] = str(user['_id'])
-        return users
+        if origin:
+            geo_near = _geo_near(origin, user_preferences, query)
+            pipeline = [{"$geoNear": geo_near}]
+            if after and after.get("distance") is not None:
+                # minDistance prunes the index scan; the $match breaks ties on id
+                geo_near["minDistance"] = max(0, after["distance"] * 1000 - 1)
+                pipeline.append({"$match": {"$or": [
+                    {"distance": {"$gt": after["distance"]}},
+                    {"distance": after["distance"], "id": {"$gt": after["id"]}}
+                ]}})
+            pipeline.append({"$limit": scan_limit})
+            if projection:
+                pipeline.append({"$project": projection})
+            cursor = get_users_collection().aggregate(pipeline, batchSize=limit)
+        else:
+            if after:
+                query["id"]["$gt"] = after["id"]
+            cursor = get_users_collection().find(query, projection).sort("id", 1).limit(scan_limit).batch_size(limit)
+        
+        users = []
+        scanned = 0
+        position = None
+        async for user in cursor:
+            scanned += 1
+            position = {"distance": user.get("distance"), "id": user["id"]}
+            if swipe_filter is not None and user["id"] in swipe_filter:
+                continue
+            users.append(_stringify_id(user))
+            if len(users) >= limit:
+                break
+        else:
+            if scanned < scan_limit:
+                position = None  # The cursor ran dry before the scan cap
+        await cursor.close()
+        return users, position
+    
+    @staticmethod
+    async def get_candidates_by_ids(
+        user_preferences: dict,
+        candidate_ids: List[str],
+        origin: Optional[dict] = None,
+        projection: Optional[dict] = None
+    ) -> List[dict]:
+        """Get the given users that pass the age and distance preferences, in input order
+        
+        The id index drives the lookup; with an origin, $geoWithin drops
+        out-of-range users in Mongo and the distance is computed here.
+        """
+        query = {
+            "id": {"$in": candidate_ids},
+            "age": {
+                "$gte": user_preferences.get("min_age", 18),
+                "$lte": user_preferences.get("max_age", 35)
+            },
+            "is_active": True
+        }
+        if origin:
+            radius = user_preferences.get("max_distance", 25) / EARTH_RADIUS_KM
+            query["geo"] = {"$geoWithin": {"$centerSphere": [origin["coordinates"], radius]}}
+        cursor = get_users_collection().find(query, projection)
+        users = await cursor.to_list(length=len(candidate_ids))
+        users_by_id = {user["id"]: _stringify_id(user) for user in users}
+        candidates = []
+        for candidate_id in candidate_ids:
+            user = users_by_id.get(candidate_id)
+            if user is None:
+                continue
+            if origin:
+                user["distance"] = distance_km(origin, user.get("geo"))
+            candidates.append(user)
+        return candidates
     
     @staticmethod
-    async def create_swipe(swipe_data: dict) -> dict:
-        """Create a swipe record"""
-        result = await get_swipes_collection().insert_one(swipe_data)
+    async def get_users_updated_since(since: Optional[datetime]) -> List[dict]:
+        """Get id, interests and status of users updated at or after a time (all users if None)"""
+        query = {"updated_at": {"$gte": since}} if since else {}
+        return await get_users_collection().find(
+            query,
+            {"_id": 0, "id": 1, "interests": 1, "is_active": 1, "updated_at": 1}
+        ).sort("updated_at", 1).to_list(length=None)
+    
+    @staticmethod
+    async def create_swipe(swipe_data: dict) -> Optional[dict]:
+        """Create a swipe record, or return None if this pair was already swiped
+        
+        Duplicates are caught by the unique (swiper_id, swiped_id) index.
+        """
+        try:
+            result = await get_swipes_collection().insert_one(swipe_data)
+        except DuplicateKeyError:
+            return None
         swipe_data['_id'] = str(result.inserted_id)
         return swipe_data
     
     @staticmethod
-    async def get_swipe(swiper_id: str, swiped_id: str) -> Optional[dict]:
-        """Get existing swipe between two users"""
-        swipe = await get_swipes_collection().find_one({
-            "swiper_id": swiper_id,
-            "swiped_id": swiped_id
-        })
-        if swipe:
-            swipe['_id'] = str(swipe['_id'])
-        return swipe
+    async def create_swipes(swipes_data: List[dict]) -> List[bool]:
+        """Insert many swipes in one unordered bulk write
+        
+        Returns, per swipe, whether it was inserted; duplicates of earlier
+        swipes are rejected by the unique index without failing the rest.
+        """
+        if not swipes_data:
+            return []
+        inserted = [True] * len(swipes_data)
+        try:
+            await get_swipes_collection().insert_many(swipes_data, ordered=False)
+        except BulkWriteError as exc:
+            for error in exc.details["writeErrors"]:
+                if error["code"] != 11000:
+                    raise
+                inserted[error["index"]] = False
+        for swipe in swipes_data:
+            _stringify_id(swipe)
+        return inserted
+    
+    @staticmethod
+    async def delete_swipe(swipe_id: str) -> bool:
+        """Delete a swipe record"""
+        result = await get_swipes_collection().delete_one({"id": swipe_id})
+        return result.deleted_count > 0
     
     @staticmethod
     async def get_user_swipes(user_id: str) -> List[str]:
         """Get all user IDs that a user has swiped on"""
-        swipes = await get_swipes_collection().find({"swiper_id": user_id}).to_list(length=None)
+        swipes = await get_swipes_collection().find(
+            {"swiper_id": user_id},
+            {"_id": 0, "swiped_id": 1}
+        ).to_list(length=None)
         return [swipe['swiped_id'] for swipe in swipes]
     
     @staticmethod
-    async def check_mutual_like(user1_id: str, user2_id: str) -> bool:
-        """Check if both users liked each other"""
-        swipe1 = await get_swipes_collection().find_one({
-            "swiper_id": user1_id,
-            "swiped_id": user2_id,
+    async def get_likes_between(swiper_ids: List[str], swiped_ids: List[str]) -> List[tuple]:
+        """Get (swiper_id, swiped_id) pairs of likes from any swiper to any swiped user, in one query"""
+        swipes = await get_swipes_collection().find({
+            "swiper_id": {"$in": swiper_ids},
+            "swiped_id": {"$in": swiped_ids},
             "action": "like"
-        })
-        swipe2 = await get_swipes_collection().find_one({
-            "swiper_id": user2_id,
-            "swiped_id": user1_id,
+        }, {"_id": 0, "swiper_id": 1, "swiped_id": 1}).to_list(length=None)
+        return [(swipe["swiper_id"], swipe["swiped_id"]) for swipe in swipes]
+    
+    @staticmethod
+    async def get_swipe_filter(user_id: str) -> Optional[dict]:
+        """Get the persisted swiped-ID Bloom filter for a user"""
+        return await get_swipe_filters_collection().find_one({"user_id": user_id}, {"_id": 0})
+    
+    @staticmethod
+    async def save_swipe_filter(filter_data: dict) -> None:
+        """Create or replace a user's swiped-ID Bloom filter"""
+        await get_swipe_filters_collection().replace_one(
+            {"user_id": filter_data["user_id"]},
+            filter_data,
+            upsert=True
+        )
+    
+    @staticmethod
+    async def add_swipe_filter_bits(user_id: str, capacity: int, masks: Dict[int, Any], count: int = 1) -> bool:
+        """Atomically OR bits into a user's Bloom filter if it still has the given capacity"""
+        result = await get_swipe_filters_collection().update_one(
+            {"user_id": user_id, "capacity": capacity},
+            {
+                "$bit": {f"words.{index}": {"or": mask} for index, mask in masks.items()},
+                "$inc": {"count": count}
+            }
+        )
+        return result.matched_count > 0
+    
+    @staticmethod
+    async def has_liked(swiper_id: str, swiped_id: str) -> bool:
+        """Check if one user liked another"""
+        swipe = await get_swipes_collection().find_one({
+            "swiper_id": swiper_id,
+            "swiped_id": swiped_id,
             "action": "like"
-        })
-        return swipe1 is not None and swipe2 is not None
+        }, {"_id": 1})
+        return swipe is not None
     
     @staticmethod
-    async def create_match(match_data: dict) -> dict:
-        """Create a match record"""
-        result = await get_matches_collection().insert_one(match_data)
-        match_data['_id'] = str(result.inserted_id)
-        return match_data
+    async def create_match(match_data: dict) -> bool:
+        """Create a match record unless the pair is already matched
+        
+        The upsert on the unique pair_key makes concurrent mutual likes
+        produce a single match. Returns True if this call created it.
+        """
+        _prepare_match(match_data)
+        try:
+            result = await get_matches_collection().update_one(
+                {"pair_key": match_data["pair_key"]},
+                {"$setOnInsert": match_data},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Lost the upsert race to the other user's like
+            return False
+        return result.upserted_id is not None
     
     @staticmethod
-    async def get_user_matches(user_id: str) -> List[dict]:
-        """Get all matches for a user"""
-        matches = await get_matches_collection().find({
-            "$or": [
-                {"user1_id": user_id},
-                {"user2_id": user_id}
-            ],
-            "is_active": True
-        }).to_list(length=None)
+    async def create_matches(matches_data: List[dict]) -> List[dict]:
+        """Create many matches in one unordered bulk upsert, skipping pairs already matched
         
-        for match in matches:
-            match['_id'] = str(match['_id'])
-        return matches
+        Returns the matches this call created.
+        """
+        if not matches_data:
+            return []
+        operations = []
+        for match_data in matches_data:
+            _prepare_match(match_data)
+            operations.append(UpdateOne(
+                {"pair_key": match_data["pair_key"]},
+                {"$setOnInsert": match_data},
+                upsert=True
+            ))
+        try:
+            result = await get_matches_collection().bulk_write(operations, ordered=False)
+            upserted = result.upserted_ids
+        except BulkWriteError as exc:
+            # Concurrent upserts of the same pair; the match exists either way
+            if any(error["code"] != 11000 for error in exc.details["writeErrors"]):
+                raise
+            upserted = {item["index"]: item["_id"] for item in exc.details["upserted"]}
+        return [matches_data[index] for index in sorted(upserted)]
+    
+    @staticmethod
+    async def get_user_match(match_id: str, user_id: str) -> Optional[dict]:
+        """Get an active match by ID if the user is one of its participants"""
+        return await get_matches_collection().find_one({
+            "id": match_id,
+            "is_active": True,
+            "$or": [{"user1_id": user_id}, {"user2_id": user_id}]
+        }, {"_id": 0, "id": 1, "user1_id": 1, "user2_id": 1})
+    
+    @staticmethod
+    async def deactivate_match(match_id: str, user_id: str) -> Optional[dict]:
+        """Deactivate a user's active match, returning its participants if it was active"""
+        return await get_matches_collection().find_one_and_update(
+            {
+                "id": match_id,
+                "is_active": True,
+                "$or": [{"user1_id": user_id}, {"user2_id": user_id}]
+            },
+            {"$set": {"is_active": False, "updated_at": datetime.utcnow()}},
+            projection={"_id": 0, "id": 1, "user1_id": 1, "user2_id": 1}
+        )
     
     @staticmethod
     async def create_message(message_data: dict) -> dict:
-        """Create a message"""
-        result = await get_messages_collection().insert_one(message_data)
+        """Create a message and add it to the search index"""
+        if message_storage == "buckets":
+            query, update = message_buckets.append_update(message_data)
+            await asyncio.gather(
+                get_message_buckets_collection().update_one(query, update, upsert=True),
+                _index_for_search(message_data)
+            )
+            return message_data
+        result, _ = await asyncio.gather(
+            get_messages_collection().insert_one(message_data),
+            _index_for_search(message_data)
+        )
         message_data['_id'] = str(result.inserted_id)
         return message_data
     
     @staticmethod
-    async def get_match_messages(match_id: str) -> List[dict]:
-        """Get all messages for a match"""
-        messages = await get_messages_collection().find({
-            "match_id": match_id
-        }).sort("created_at", 1).to_list(length=None)
+    async def get_match_messages(
+        match_id: str,
+        projection: Optional[dict] = None,
+        limit: Optional[int] = None,
+        before: Optional[dict] = None,
+        after: Optional[dict] = None
+    ) -> List[dict]:
+        """Get messages for a match in chronological order
+        
+        With a limit, returns the newest `limit` messages, or the page right
+        before/after a {"created_at", "id"} keyset position. Pages are read
+        straight off the (match_id, created_at, id) index.
+        """
+        query: Dict[str, Any] = {"match_id": match_id}
+        position = after or before
+        if position:
+            query.update(_message_keyset("$gt" if after else "$lt", position))
         
+        # Newest-first when paging backwards, then flipped to chronological order
+        direction = 1 if after or limit is None else -1
+        cursor = get_messages_collection().find(query, projection).sort([("created_at", direction), ("id", direction)])
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        messages = await cursor.to_list(length=limit)
         for message in messages:
-            message['_id'] = str(message['_id'])
+            _stringify_id(message)
+        
+        if message_storage == "buckets":
+            bucket_query: Dict[str, Any] = {"match_id": match_id}
+            if after:
+                bucket_query["end"] = {"$gte": after["created_at"]}
+            elif before:
+                bucket_query["start"] = {"$lte": before["created_at"]}
+            bucketed = await _read_buckets(
+                bucket_query,
+                _in_keyset("$gt" if after else "$lt", position) if position else lambda message: True,
+                descending=direction == -1,
+                limit=limit
+            )
+            messages = _merge_messages(messages, bucketed, descending=direction == -1, limit=limit)
+        
+        if direction == -1:
+            messages.reverse()
         return messages
     
     @staticmethod
-    async def update_match_last_message(match_id: str, last_message_at: Any) -> bool:
-        """Update the last message time for a match"""
+    async def update_match_last_message(match_id: str, message: dict) -> bool:
+        """Store a summary of a new message on its match and bump the receiver's unread count
+        
+        Both happen in one atomic update. Two messages sent within the same
+        moment may leave either one as the summary.
+        """
         result = await get_matches_collection().update_one(
             {"id": match_id},
-            {"$set": {"last_message_at": last_message_at}}
+            {
+                "$set": {
+                    "last_message": message["content"][:LAST_MESSAGE_PREVIEW_LENGTH],
+                    "last_message_at": message["created_at"],
+                    "last_message_sender_id": message["sender_id"],
+                    "activity_at": message["created_at"],
+                    "updated_at": datetime.utcnow()
+                },
+                "$inc": {f"unread_counts.{message['receiver_id']}": 1}
+            }
+        )
+        return result.modified_count > 0
+    
+    @staticmethod
+    async def get_read_positions(match_ids: List[str]) -> Dict[str, Dict[str, dict]]:
+        """Get each participant's read watermark for the given matches, keyed by match then user ID"""
+        matches = await get_matches_collection().find(
+            {"id": {"$in": match_ids}},
+            {"_id": 0, "id": 1, "last_read": 1}
+        ).to_list(length=None)
+        return {match["id"]: match.get("last_read") or {} for match in matches}
+    
+    @staticmethod
+    async def mark_match_read(match_id: str, user_id: str, up_to: Optional[str] = None) -> Optional[Tuple[Optional[str], int, int]]:
+        """Advance a user's read watermark in a match to a message, or to the latest message
+        
+        Reading is one conditional update of the match: messages are never
+        written, their read state is derived from the watermark. Returns the
+        message read through, how many received messages became read and the
+        user's remaining unread count, or None if up_to is not a message in
+        the match.
+        """
+        target = await _find_message(match_id, up_to)
+        if target is None:
+            return None if up_to else (None, 0, 0)
+        position = {"created_at": target["created_at"], "id": target["id"]}
+        
+        field = f"last_read.{user_id}"
+        unread_field = f"unread_counts.{user_id}"
+        unread = 0
+        for _ in range(READ_RETRIES):
+            match = await get_matches_collection().find_one({"id": match_id}, {"_id": 0, field: 1, unread_field: 1})
+            if match is None:
+                return None
+            current = (match.get("last_read") or {}).get(user_id)
+            unread = (match.get("unread_counts") or {}).get(user_id, 0)
+            if current and (current["created_at"], current["id"]) >= (target["created_at"], target["id"]):
+                return target["id"], 0, unread
+            
+            # Received messages between the old and new watermark
+            marked = await _count_received(match_id, user_id, after=current, through=position)
+            
+            # Only applies if no concurrent read moved the watermark in between
+            now = datetime.utcnow()
+            updated = await get_matches_collection().find_one_and_update(
+                {"id": match_id, field: current if current else {"$exists": False}},
+                {
+                    "$set": {field: position, f"read_at.{user_id}": now, "updated_at": now},
+                    "$inc": {unread_field: -marked}
+                },
+                projection={"_id": 0, "unread_counts": 1},
+                return_document=ReturnDocument.AFTER
+            )
+            if updated is not None:
+                return target["id"], marked, max(updated["unread_counts"][user_id], 0)
+        return target["id"], 0, unread
+    
+    @staticmethod
+    async def recount_unread() -> int:
+        """Recompute every match's unread counts from messages past each read watermark, repairing drift"""
+        operations = []
+        async for match in get_matches_collection().find({}, {"_id": 0, "id": 1, "user1_id": 1, "user2_id": 1, "last_read": 1}):
+            counts = {}
+            for user_id in (match["user1_id"], match["user2_id"]):
+                position = (match.get("last_read") or {}).get(user_id)
+                count = await _count_received(match["id"], user_id, after=position)
+                if count:
+                    counts[user_id] = count
+            operations.append(UpdateOne({"id": match["id"]}, {"$set": {"unread_counts": counts}}))
+        if not operations:
+            return 0
+        result = await get_matches_collection().bulk_write(operations, ordered=False)
+        return result.modified_count
+    
+    @staticmethod
+    async def get_match_summaries(
+        user_id: str,
+        limit: int = 20,
+        after: Optional[dict] = None
+    ) -> List[dict]:
+        """Get a page of a user's active matches with the other user's card, most recent activity first
+        
+        One aggregation: matches are read in (activity_at, id) order from the
+        per-participant indexes, then only the page's other users are joined
+        with $lookup on users.id. `after` is the {"activity_at", "id"} keyset
+        position of the last match on the previous page. Matches whose other
+        user no longer exists come back without user_id. Relies on
+        backfill_activity_at having run for matches that predate the field.
+        """
+        branches = [
+            {"user1_id": user_id, "is_active": True},
+            {"user2_id": user_id, "is_active": True}
+        ]
+        if after:
+            for branch in branches:
+                branch["$or"] = [
+                    {"activity_at": {"$lt": after["activity_at"]}},
+                    {"activity_at": after["activity_at"], "id": {"$lt": after["id"]}}
+                ]
+        pipeline = [
+            {"$match": {"$or": branches}},
+            {"$sort": {"activity_at": -1, "id": -1}},
+            {"$limit": limit},
+            *_join_other_user(user_id, {
+                "id": 1,
+                "created_at": 1,
+                "last_message": 1,
+                "last_message_at": 1,
+                "activity_at": 1
+            })
+        ]
+        return await get_matches_collection().aggregate(pipeline).to_list(length=limit)
+    
+    @staticmethod
+    async def get_match_changes(user_id: str, since: Optional[datetime], limit: int) -> List[dict]:
+        """Get a user's matches changed at or after `since`, including deactivated ones, oldest change first
+        
+        Reads the per-participant (updated_at, id) indexes and joins the
+        other user's card like get_match_summaries.
+        """
+        branches = [{"user1_id": user_id}, {"user2_id": user_id}]
+        if since:
+            for branch in branches:
+                branch["updated_at"] = {"$gte": since}
+        pipeline = [
+            {"$match": {"$or": branches}},
+            {"$sort": {"updated_at": 1, "id": 1}},
+            {"$limit": limit},
+            *_join_other_user(user_id, {
+                "id": 1,
+                "created_at": 1,
+                "updated_at": 1,
+                "is_active": 1,
+                "last_message": 1,
+                "last_message_at": 1,
+                "read_at": 1,
+                "last_read": 1
+            })
+        ]
+        return await get_matches_collection().aggregate(pipeline).to_list(length=limit)
+    
+    @staticmethod
+    async def get_messages_since(
+        user_id: str,
+        since: Optional[datetime],
+        limit: int,
+        projection: Optional[dict] = None
+    ) -> List[dict]:
+        """Get messages a user sent or received at or after `since` in chronological order"""
+        branches = [{"sender_id": user_id}, {"receiver_id": user_id}]
+        if since:
+            for branch in branches:
+                branch["created_at"] = {"$gte": since}
+        messages = await get_messages_collection().find(
+            {"$or": branches}, projection
+        ).sort([("created_at", 1), ("id", 1)]).limit(limit).to_list(length=limit)
+        for message in messages:
+            _stringify_id(message)
+        
+        if message_storage == "buckets":
+            # A bucket ending after `since` starts at most one span before it
+            bucket_query: Dict[str, Any] = {"user_ids": user_id}
+            if since:
+                bucket_query["start"] = {"$gte": since - message_buckets.BUCKET_SPAN}
+            bucketed = await _read_buckets(
+                bucket_query,
+                lambda message: since is None or message["created_at"] >= since,
+                limit=limit
+            )
+            messages = _merge_messages(messages, bucketed, limit=limit)
+        return messages
+    
+    @staticmethod
+    async def backfill_match_summaries() -> int:
+        """Rebuild last-message summaries on all matches from the messages collection"""
+        pipeline = [
+            {"$sort": {"match_id": 1, "created_at": 1}},
+            {"$group": {
+                "_id": "$match_id",
+                "content": {"$last": "$content"},
+                "created_at": {"$last": "$created_at"},
+                "sender_id": {"$last": "$sender_id"}
+            }}
+        ]
+        operations = [
+            UpdateOne({"id": summary["_id"]}, {"$set": {
+                "last_message": summary["content"][:LAST_MESSAGE_PREVIEW_LENGTH],
+                "last_message_at": summary["created_at"],
+                "last_message_sender_id": summary["sender_id"],
+                "activity_at": summary["created_at"]
+            }})
+            async for summary in get_messages_collection().aggregate(pipeline, allowDiskUse=True)
+        ]
+        modified = 0
+        if operations:
+            result = await get_matches_collection().bulk_write(operations, ordered=False)
+            modified = result.modified_count
+        
+        return modified + await DatabaseService.backfill_activity_at()
+    
+    @staticmethod
+    async def backfill_activity_at() -> int:
+        """Stamp activity_at and updated_at on matches created before they were stored
+        
+        Run at startup so the index-backed match list and sync never see a
+        match without them. Matches without messages are active from the
+        moment they were created.
+        """
+        result = await get_matches_collection().update_many(
+            {"activity_at": {"$exists": False}},
+            [{"$set": {"activity_at": {"$ifNull": ["$last_message_at", "$created_at"]}}}]
         )
-        return result.modified_count > 0
\ No newline at end of file
+        modified = result.modified_count
+        result = await get_matches_collection().update_many(
+            {"updated_at": {"$exists": False}},
+            [{"$set": {"updated_at": "$activity_at"}}]
+        )
+        return modified + result.modified_count
+    
+    @staticmethod
+    async def migrate_messages_to_buckets() -> int:
+        """Move per-message documents into closed buckets, returning how many messages moved
+        
+        Safe to interrupt and re-run: a bucket's ID derives from its first
+        message, so repeating a half-finished bucket overwrites it.
+        """
+        moved = 0
+        bucket: List[dict] = []
+        
+        async def flush():
+            document = message_buckets.build_bucket(bucket[0]["match_id"], bucket)
+            await get_message_buckets_collection().replace_one({"_id": document["_id"]}, document, upsert=True)
+            await get_messages_collection().delete_many({"id": {"$in": [message["id"] for message in bucket]}})
+        
+        cursor = get_messages_collection().find({}, {"_id": 0}).sort([("match_id", 1), ("created_at", 1), ("id", 1)])
+        async for message in cursor:
+            if bucket and (
+                message["match_id"] != bucket[0]["match_id"]
+                or len(bucket) >= message_buckets.BUCKET_SIZE
+                or message["created_at"] - bucket[0]["created_at"] > message_buckets.BUCKET_SPAN
+            ):
+                await flush()
+                moved += len(bucket)
+                bucket = []
+            bucket.append(message)
+        if bucket:
+            await flush()
+            moved += len(bucket)
+        return moved
+    
+    @staticmethod
+    async def compress_message_buckets(older_than: datetime) -> int:
+        """Compress buckets whose messages all predate `older_than` and that can no longer grow"""
+        cutoff = min(older_than, message_buckets.closed_before(datetime.utcnow()))
+        compressed = 0
+        async for bucket in get_message_buckets_collection().find({"compressed": {"$ne": True}, "end": {"$lt": cutoff}}):
+            # The count guard skips a bucket that took a message since it was read
+            result = await get_message_buckets_collection().update_one(
+                {"_id": bucket["_id"], "count": bucket["count"]},
+                {
+                    "$set": {"data": message_buckets.compress(bucket["messages"]), "compressed": True, "open": False},
+                    "$unset": {"messages": ""}
+                }
+            )
+            compressed += result.modified_count
+        return compressed
+    
+    @staticmethod
+    async def get_active_match_ids(user_id: str) -> List[str]:
+        """IDs of a user's active matches"""
+        matches = await get_matches_collection().find(
+            {"$or": [{"user1_id": user_id}, {"user2_id": user_id}], "is_active": True},
+            {"_id": 0, "id": 1}
+        ).to_list(length=None)
+        return [match["id"] for match in matches]
+    
+    @staticmethod
+    async def search_messages(match_ids: List[str], terms: List[str], limit: int = MAX_SEARCH_CANDIDATES) -> List[dict]:
+        """Most recent indexed messages in the given matches containing any of the terms
+        
+        The (terms, match_id) index turns this into one range per term and
+        match, so only the user's own conversations are read.
+        """
+        if not match_ids or not terms:
+            return []
+        return await get_message_search_collection().find(
+            {"terms": {"$in": terms}, "match_id": {"$in": match_ids}},
+            {"_id": 0, "terms": 0}
+        ).sort([("created_at", -1)]).limit(limit).to_list(length=limit)
+    
+    @staticmethod
+    async def index_messages_for_search() -> int:
+        """Build search index entries for every stored message, returning how many were written"""
+        async def all_messages():
+            async for message in get_messages_collection().find({}, {"_id": 0}):
+                yield message
+            async for bucket in get_message_buckets_collection().find({}):
+                for message in message_buckets.unpack(bucket):
+                    yield message
+        
+        written = 0
+        operations = []
+        async for message in all_messages():
+            document = _search_document(message)
+            if document["terms"]:
+                operations.append(ReplaceOne({"id": document["id"]}, document, upsert=True))
+            if len(operations) >= SEARCH_INDEX_BATCH:
+                await get_message_search_collection().bulk_write(operations, ordered=False)
+                written += len(operations)
+                operations = []
+        if operations:
+            await get_message_search_collection().bulk_write(operations, ordered=False)
+            written += len(operations)
+        return written
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+from services.database import DatabaseService, CANDIDATE_PROJECTION
+from services.interest_index import interest_index
+from services.ranking import rank_candidates
+from services.swipe_filter import swipe_filters
+
+logger = logging.getLogger(__name__)
+
+DECK_SIZE = 300  # Candidates fetched and ranked per refill
+LOW_WATER = 20  # Refill in the background below this many candidates
+MAX_DECK_ENTRIES = 1000  # Hard cap when clients page ahead without swiping
+MAX_DECKS = 10000  # Least recently used decks are dropped beyond this
+EXHAUSTED_COOLDOWN = 30  # Seconds before re-querying a pool that ran dry
+ID_LOOKUP_CHUNK = 200  # Candidate IDs per point-lookup query for interest-filtered decks
+MAX_REFILL_SCANS = 5  # Capped scans per refill when most nearby users were already swiped
+
+class DeckEntry(NamedTuple):
+    candidate_id: str
+    seq: int  # Position in the deck, used as the pagination key
+    distance: Optional[float]  # Kilometers, None when unknown
+    # Scan position after the refill batch this entry came from, None at the end of the pool
+    resume_after: Optional[dict]
+
+class DiscoveryDeck:
+    """Ranked queue of candidate IDs prepared for one user"""
+
+    def __init__(self):
+        # Cursors minted for another deck resume from their scan position instead of their seq
+        self.generation = uuid.uuid4().hex[:12]
+        # candidate_id -> entry, in ranked order
+        self.entries: "OrderedDict[str, DeckEntry]" = OrderedDict()
+        self.next_seq = 0
+        # Keyset {"distance", "id"} or interest-list {"offset"} position of the last
+        # candidate fetched, so refills never re-scan
+        self.resume_after: Optional[dict] = None
+        # IDs swiped while a refill was in flight, so it cannot re-add them
+        self.consumed: set = set()
+        self.refill_task: Optional[asyncio.Task] = None
+        self.exhausted_at: Optional[float] = None
+
+    def page(self, count: int, after_seq: Optional[int]) -> List[DeckEntry]:
+        page = []
+        for entry in self.entries.values():
+            if after_seq is not None and entry.seq <= after_seq:
+                continue
+            page.append(entry)
+            if len(page) >= count:
+                break
+        return page
+
+    def is_exhausted(self) -> bool:
+        return self.exhausted_at is not None and time.monotonic() - self.exhausted_at < EXHAUSTED_COOLDOWN
+
+class DeckManager:
+    """Per-user discovery decks refilled by background asyncio tasks"""
+
+    def __init__(self, deck_size: int = DECK_SIZE, low_water: int = LOW_WATER, max_decks: int = MAX_DECKS):
+        self.deck_size = deck_size
+        self.low_water = low_water
+        self.max_decks = max_decks
+        self._decks: "OrderedDict[str, DiscoveryDeck]" = OrderedDict()
+
+    def _get_deck(self, user_id: str) -> DiscoveryDeck:
+        deck = self._decks.get(user_id)
+        if deck is None:
+            deck = DiscoveryDeck()
+            self._decks[user_id] = deck
+            while len(self._decks) > self.max_decks:
+                _, evicted = self._decks.popitem(last=False)
+                if evicted.refill_task:
+                    evicted.refill_task.cancel()
+        else:
+            self._decks.move_to_end(user_id)
+        return deck
+
+    async def peek(
+        self,
+        user: dict,
+        count: int,
+        after_seq: Optional[int] = None,
+        generation: Optional[str] = None,
+        resume_after: Optional[dict] = None
+    ) -> Tuple[List[DeckEntry], str]:
+        """Return the next candidates after a deck position without removing them
+        
+        A position from a deck that was evicted, reset or built by another
+        worker carries no meaning here, so a fresh deck is started from the
+        position's `resume_after` scan position instead. Candidates left
+        unshown in that refill batch come back once the pool is rescanned.
+        """
+        deck = self._get_deck(user["id"])
+        if after_seq is not None and generation != deck.generation:
+            deck = self._restart_deck(user["id"], resume_after)
+            after_seq = None
+
+        page = deck.page(count, after_seq)
+        if len(page) < count and not deck.is_exhausted() and len(deck.entries) < MAX_DECK_ENTRIES:
+            # Not enough prepared for this page, so wait for a refill
+            self._schedule_refill(deck, user, extra=count - len(page), force=True)
+            if deck.refill_task:
+                await asyncio.shield(deck.refill_task)
+            page = deck.page(count, after_seq)
+        elif len(deck.entries) < self.low_water:
+            self._schedule_refill(deck, user)
+        return page, deck.generation
+
+    def _restart_deck(self, user_id: str, resume_after: Optional[dict]) -> DiscoveryDeck:
+        self.reset(user_id)
+        deck = self._get_deck(user_id)
+        deck.resume_after = resume_after
+        if resume_after is None:
+            # The cursor's batch ended the pool
+            deck.exhausted_at = time.monotonic()
+        return deck
+
+    def consume(self, user: dict, swiped_id: str):
+        """Remove a swiped candidate from the user's deck"""
+        deck = self._decks.get(user["id"])
+        if deck is None:
+            return
+        deck.entries.pop(swiped_id, None)
+        if deck.refill_task:
+            deck.consumed.add(swiped_id)
+        if len(deck.entries) < self.low_water:
+            self._schedule_refill(deck, user)
+
+    def reset(self, user_id: str):
+        """Drop a user's deck, e.g. after their preferences or location change"""
+        deck = self._decks.pop(user_id, None)
+        if deck and deck.refill_task:
+            deck.refill_task.cancel()
+
+    def _schedule_refill(self, deck: DiscoveryDeck, user: dict, extra: int = 0, force: bool = False):
+        if deck.refill_task:
+            return
+        if not force and deck.is_exhausted():
+            return
+        limit = min(max(self.deck_size - len(deck.entries), extra), MAX_DECK_ENTRIES - len(deck.entries))
+        if limit <= 0:
+            return
+        deck.consumed = set()
+        deck.refill_task = asyncio.create_task(self._refill(deck, dict(user), limit))
+
+    async def _refill(self, deck: DiscoveryDeck, user: dict, limit: int):
+        try:
+            swipe_filter = await swipe_filters.get(user["id"])
+            min_shared = user["preferences"].get("min_shared_interests", 0)
+            if min_shared:
+                candidates, position = await self._fetch_sharing_interests(
+                    deck, user, swipe_filter, limit, min_shared, (deck.resume_after or {}).get("offset", 0)
+                )
+                exhausted = position is None
+            else:
+                candidates = []
+                position = deck.resume_after
+                for _ in range(MAX_REFILL_SCANS):
+                    batch, position = await DatabaseService.get_potential_matches(
+                        user["id"],
+                        user["preferences"],
+                        list(deck.entries),
+                        origin=user.get("geo"),
+                        limit=limit - len(candidates),
+                        swipe_filter=swipe_filter,
+                        after=position,
+                        projection=CANDIDATE_PROJECTION
+                    )
+                    candidates += batch
+                    # A short batch with a position means the scan cap was hit among swiped users
+                    if position is None or len(candidates) >= limit:
+                        break
+                exhausted = position is None
+            # Each refill batch is appended to the deck in ranked order
+            for candidate in rank_candidates(user, candidates):
+                if candidate["id"] in deck.consumed or candidate["id"] in deck.entries:
+                    continue
+                deck.entries[candidate["id"]] = DeckEntry(
+                    candidate["id"], deck.next_seq, candidate.get("distance"), None if exhausted else position
+                )
+                deck.next_seq += 1
+
+            if exhausted:
+                # Reached the end of the pool; rescan from the start after the cooldown
+                deck.exhausted_at = time.monotonic()
+                deck.resume_after = None
+            else:
+                deck.exhausted_at = None
+                deck.resume_after = position
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Failed to refill discovery deck for user %s", user["id"])
+        finally:
+            deck.refill_task = None
+            deck.consumed = set()
+
+    async def _fetch_sharing_interests(
+        self,
+        deck: DiscoveryDeck,
+        user: dict,
+        swipe_filter,
+        limit: int,
+        min_shared: int,
+        offset: int = 0
+    ) -> Tuple[List[dict], Optional[dict]]:
+        """Candidates sharing at least min_shared interests, found via the inverted index
+        
+        Reads the ranked ID list from `offset` on, and also returns the
+        {"offset"} position to resume from, or None once the list is used up.
+        """
+        shared = interest_index.users_sharing(user.get("interests") or [], min_shared)
+        ranks = {}
+        candidates = []
+        while offset < len(shared) and len(candidates) < limit:
+            chunk = shared[offset:offset + ID_LOOKUP_CHUNK]
+            candidate_ids = []
+            for rank, (candidate_id, _) in enumerate(chunk, start=offset):
+                if candidate_id != user["id"] and candidate_id not in deck.entries and candidate_id not in swipe_filter:
+                    ranks[candidate_id] = rank
+                    candidate_ids.append(candidate_id)
+            offset += len(chunk)
+            if candidate_ids:
+                candidates += await DatabaseService.get_candidates_by_ids(
+                    user["preferences"],
+                    candidate_ids,
+                    origin=user.get("geo"),
+                    projection=CANDIDATE_PROJECTION
+                )
+        if len(candidates) > limit:
+            # Resume right after the last candidate kept, so the rest of the chunk is read again next time
+            candidates = candidates[:limit]
+            offset = ranks[candidates[-1]["id"]] + 1
+        if offset >= len(shared):
+            return candidates, None
+        return candidates, {"offset": offset}
+
+    async def close(self):
+        """Cancel any in-flight refills"""
+        tasks = [deck.refill_task for deck in self._decks.values() if deck.refill_task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._decks.clear()
+
+discovery_decks = DeckManager()
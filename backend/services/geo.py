@@ -0,0 +1,32 @@
+import math
+from typing import Optional
+
+EARTH_RADIUS_KM = 6371.0088
+
+def to_geo_point(location: Optional[dict]) -> Optional[dict]:
+    """Convert a {"lat", "lng"} location into a GeoJSON point"""
+    if not location or location.get("lat") is None or location.get("lng") is None:
+        return None
+    # GeoJSON stores coordinates as [longitude, latitude]
+    return {
+        "type": "Point",
+        "coordinates": [float(location["lng"]), float(location["lat"])]
+    }
+
+def distance_km(point1: Optional[dict], point2: Optional[dict]) -> Optional[float]:
+    """Great-circle distance in kilometers between two GeoJSON points"""
+    if not point1 or not point2:
+        return None
+    lng1, lat1 = map(math.radians, point1["coordinates"])
+    lng2, lat2 = map(math.radians, point2["coordinates"])
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+def round_distance(distance: Optional[float]) -> Optional[int]:
+    """Round a distance in kilometers for display, never showing 0 km"""
+    if distance is None:
+        return None
+    return max(1, round(distance))
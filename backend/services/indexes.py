@@ -0,0 +1,136 @@
+import logging
+from typing import Dict, List
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, IndexModel
+from pymongo.errors import OperationFailure
+from services import database
+
+logger = logging.getLogger(__name__)
+
+# Indexes every collection needs, keyed by collection name
+REQUIRED_INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("geo", GEOSPHERE)], name="geo_2dsphere"),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ],
+    "swipes": [
+        # Serves duplicate detection, reciprocity checks and swiper_id scans
+        IndexModel([("swiper_id", ASCENDING), ("swiped_id", ASCENDING)], name="swiper_swiped_unique", unique=True),
+    ],
+    "matches": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Each participant's inbox in activity order; $or merges the two sorted scans
+        IndexModel(
+            [("user1_id", ASCENDING), ("is_active", ASCENDING), ("activity_at", DESCENDING), ("id", DESCENDING)],
+            name="user1_active_activity"
+        ),
+        IndexModel(
+            [("user2_id", ASCENDING), ("is_active", ASCENDING), ("activity_at", DESCENDING), ("id", DESCENDING)],
+            name="user2_active_activity"
+        ),
+        # Delta sync: each participant's matches in (updated_at, id) order, active or not
+        IndexModel([("user1_id", ASCENDING), ("updated_at", ASCENDING), ("id", ASCENDING)], name="user1_updated_at_id"),
+        IndexModel([("user2_id", ASCENDING), ("updated_at", ASCENDING), ("id", ASCENDING)], name="user2_updated_at_id"),
+        # One match per pair; older documents without a pair_key are left out
+        IndexModel(
+            [("pair_key", ASCENDING)],
+            name="pair_key_unique",
+            unique=True,
+            partialFilterExpression={"pair_key": {"$exists": True}}
+        ),
+    ],
+    "messages": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("match_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)],
+            name="match_created_at_id"
+        ),
+        # Delta sync: everything a user sent or received since a watermark, in (created_at, id) order
+        IndexModel([("sender_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="sender_created_at_id"),
+        IndexModel([("receiver_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="receiver_created_at_id"),
+    ],
+    "message_buckets": [
+        # History pages: newest-first scans by end, oldest-first by start
+        IndexModel([("match_id", ASCENDING), ("start", ASCENDING)], name="match_start"),
+        IndexModel([("match_id", ASCENDING), ("end", DESCENDING)], name="match_end"),
+        # Delta sync across all of a user's conversations
+        IndexModel([("user_ids", ASCENDING), ("start", ASCENDING)], name="user_ids_start"),
+    ],
+    "message_search": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # One index range per (term, match) pair; matches outside the user's are never read
+        IndexModel([("terms", ASCENDING), ("match_id", ASCENDING), ("created_at", DESCENDING)], name="terms_match_created_at"),
+    ],
+    "revoked_tokens": [
+        IndexModel([("digest", ASCENDING)], name="digest_unique", unique=True),
+        IndexModel([("revoked_at", ASCENDING)], name="revoked_at"),
+        # Records are dropped once the token would have expired anyway
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "swipe_filters": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+}
+
+# Indexes superseded by ones above, dropped so they stop costing writes
+OBSOLETE_INDEXES: Dict[str, List[str]] = {
+    "matches": ["user1_updated_at", "user2_updated_at"],
+    "messages": ["sender_created_at", "receiver_created_at"],
+}
+
+def _key(index: dict) -> tuple:
+    # IndexModel documents hold a SON mapping, index_information a list of pairs
+    key = index["key"]
+    return tuple(key.items() if hasattr(key, "items") else key)
+
+async def ensure_indexes():
+    """Create all required indexes, logging any that cannot be built"""
+    for collection_name, indexes in REQUIRED_INDEXES.items():
+        collection = database.db[collection_name]
+        for index in indexes:
+            try:
+                await collection.create_indexes([index])
+            except OperationFailure as exc:
+                # e.g. duplicate emails blocking a unique index, or a same-key index under another name
+                logger.error("Could not create index %s on %s: %s", index.document["name"], collection_name, exc)
+    for collection_name, names in OBSOLETE_INDEXES.items():
+        collection = database.db[collection_name]
+        existing = await collection.index_information()
+        for name in names:
+            if name in existing:
+                await collection.drop_index(name)
+                logger.info("Dropped obsolete index %s on %s", name, collection_name)
+
+async def index_report() -> Dict[str, Dict[str, List[str]]]:
+    """Per collection, required indexes that are missing and existing ones never used
+
+    Usage comes from $indexStats, so "unused" means no operations since the
+    server last started or the index was built.
+    """
+    report = {}
+    for collection_name, indexes in REQUIRED_INDEXES.items():
+        collection = database.db[collection_name]
+        existing = await collection.index_information()
+        existing_keys = {_key(info) for info in existing.values()}
+        missing = [
+            index.document["name"] for index in indexes
+            if _key(index.document) not in existing_keys
+        ]
+
+        unused = []
+        async for stats in collection.aggregate([{"$indexStats": {}}]):
+            if stats["name"] != "_id_" and stats["accesses"]["ops"] == 0:
+                unused.append(stats["name"])
+
+        report[collection_name] = {"missing": missing, "unused": sorted(unused)}
+    return report
+
+async def log_index_report():
+    """Log missing and unused indexes"""
+    report = await index_report()
+    for collection_name, status in report.items():
+        if status["missing"]:
+            logger.warning("Missing indexes on %s: %s", collection_name, ", ".join(status["missing"]))
+        if status["unused"]:
+            logger.info("Unused indexes on %s: %s", collection_name, ", ".join(status["unused"]))
@@ -0,0 +1,69 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from services.database import DatabaseService
+from services.periodic_refresh import PeriodicRefresh
+
+REFRESH_INTERVAL = 30  # Seconds between pulls of profiles changed by other workers
+
+def normalize_interest(interest: str) -> str:
+    return " ".join(interest.lower().split())
+
+class InterestIndex(PeriodicRefresh):
+    """In-process inverted index from interest to the IDs of active users listing it"""
+
+    description = "interest index"
+    interval = REFRESH_INTERVAL
+
+    def __init__(self):
+        super().__init__()
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._user_interests: Dict[str, FrozenSet[str]] = {}
+        self._watermark: Optional[datetime] = None
+
+    def update(self, user_id: str, interests: Iterable[str], is_active: bool = True):
+        """Replace a user's postings with their current interests"""
+        new = frozenset(normalize_interest(i) for i in interests if i.strip()) if is_active else frozenset()
+        old = self._user_interests.get(user_id, frozenset())
+        for interest in old - new:
+            postings = self._postings[interest]
+            postings.discard(user_id)
+            if not postings:
+                del self._postings[interest]
+        for interest in new - old:
+            self._postings[interest].add(user_id)
+        if new:
+            self._user_interests[user_id] = new
+        else:
+            self._user_interests.pop(user_id, None)
+
+    def remove(self, user_id: str):
+        self.update(user_id, (), is_active=False)
+
+    def users_sharing(self, interests: Iterable[str], min_shared: int = 1) -> List[Tuple[str, int]]:
+        """IDs of users sharing at least min_shared interests, most shared first"""
+        keys = {normalize_interest(i) for i in interests}
+        postings = sorted((self._postings[k] for k in keys if k in self._postings), key=len)
+        if min_shared < 1 or len(postings) < min_shared:
+            return []
+
+        if min_shared == len(postings):
+            # Everyone must share every interest: intersect, smallest list first
+            return sorted((user_id, min_shared) for user_id in set.intersection(*postings))
+
+        counts = Counter()
+        for posting in postings:
+            counts.update(posting)
+        matches = [(user_id, shared) for user_id, shared in counts.items() if shared >= min_shared]
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches
+
+    async def refresh(self):
+        """Apply profiles created or changed since the last refresh"""
+        users = await DatabaseService.get_users_updated_since(self._watermark)
+        for user in users:
+            self.update(user["id"], user.get("interests") or [], user.get("is_active", True))
+            if self._watermark is None or user["updated_at"] > self._watermark:
+                self._watermark = user["updated_at"]
+
+interest_index = InterestIndex()
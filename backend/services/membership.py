@@ -0,0 +1,35 @@
+from typing import Iterable, Optional
+from services.database import DatabaseService
+from services.ttl_cache import TTLCache
+
+CACHE_TTL = 60  # Seconds; bounds how long another worker's unmatch can go unnoticed
+MAX_ENTRIES = 100000
+
+class MatchMembershipCache:
+    """TTL/LRU cache of (user_id, match_id) -> the other participant of an active match"""
+
+    def __init__(self, ttl: float = CACHE_TTL, max_entries: int = MAX_ENTRIES):
+        self._other_users: TTLCache[str] = TTLCache(max_entries, ttl)
+
+    async def get_other_user(self, user_id: str, match_id: str) -> Optional[str]:
+        """The other user in an active match, or None if the user is not part of it"""
+        key = (user_id, match_id)
+        other_user_id = self._other_users.get(key)
+        if other_user_id is not None:
+            return other_user_id
+
+        # Point lookup on the unique match id index
+        match = await DatabaseService.get_user_match(match_id, user_id)
+        if match is None:
+            return None
+
+        other_user_id = match["user2_id"] if match["user1_id"] == user_id else match["user1_id"]
+        self._other_users.put(key, other_user_id)
+        return other_user_id
+
+    def invalidate(self, match_id: str, user_ids: Iterable[str]):
+        """Forget a match for its participants, e.g. after it is deactivated"""
+        for user_id in user_ids:
+            self._other_users.discard((user_id, match_id))
+
+match_membership = MatchMembershipCache()
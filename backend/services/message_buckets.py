@@ -0,0 +1,76 @@
+import zlib
+from datetime import datetime, timedelta
+from typing import List, Tuple
+import bson
+from bson.binary import Binary
+
+BUCKET_SIZE = 100  # Messages per bucket
+BUCKET_SPAN = timedelta(days=1)  # Longest stretch of time one bucket covers
+COMPRESSION_LEVEL = 6
+
+def bucket_id(match_id: str, first_message_id: str) -> str:
+    """Deterministic bucket _id, so re-running a migration overwrites instead of duplicating"""
+    return f"{match_id}:{first_message_id}"
+
+def _stored(message: dict) -> dict:
+    # match_id lives on the bucket; the legacy is_read flag is kept only when set
+    stored = {key: value for key, value in message.items() if key not in ("_id", "match_id", "is_read")}
+    if message.get("is_read"):
+        stored["is_read"] = True
+    return stored
+
+def append_update(message: dict) -> Tuple[dict, list]:
+    """Filter and pipeline update that append a message to its match's open bucket
+
+    The upsert starts a new bucket once the open one is full or spans more
+    than BUCKET_SPAN. Filling the last slot closes the bucket in the same
+    atomic update.
+    """
+    created_at = message["created_at"]
+    query = {
+        "match_id": message["match_id"],
+        "open": True,
+        "start": {"$gte": created_at - BUCKET_SPAN}
+    }
+    pipeline = [
+        {"$set": {
+            "user_ids": sorted((message["sender_id"], message["receiver_id"])),
+            # $literal keeps message content starting with "$" from being read as a field path
+            "messages": {"$concatArrays": [{"$ifNull": ["$messages", []]}, {"$literal": [_stored(message)]}]},
+            "count": {"$add": [{"$ifNull": ["$count", 0]}, 1]},
+            "start": {"$min": [{"$ifNull": ["$start", created_at]}, created_at]},
+            "end": {"$max": [{"$ifNull": ["$end", created_at]}, created_at]}
+        }},
+        {"$set": {"open": {"$lt": ["$count", BUCKET_SIZE]}}}
+    ]
+    return query, pipeline
+
+def build_bucket(match_id: str, messages: List[dict]) -> dict:
+    """A closed bucket holding already-stored messages, used by the migration"""
+    return {
+        "_id": bucket_id(match_id, messages[0]["id"]),
+        "match_id": match_id,
+        "user_ids": sorted({messages[0]["sender_id"], messages[0]["receiver_id"]}),
+        "messages": [_stored(message) for message in messages],
+        "count": len(messages),
+        "start": min(message["created_at"] for message in messages),
+        "end": max(message["created_at"] for message in messages),
+        "open": False
+    }
+
+def compress(messages: List[dict]) -> Binary:
+    return Binary(zlib.compress(bson.encode({"messages": messages}), COMPRESSION_LEVEL))
+
+def unpack(bucket: dict) -> List[dict]:
+    """The messages in a bucket, decompressing if needed"""
+    if bucket.get("compressed"):
+        messages = bson.decode(zlib.decompress(bucket["data"]))["messages"]
+    else:
+        messages = bucket.get("messages", [])
+    for message in messages:
+        message["match_id"] = bucket["match_id"]
+    return messages
+
+def closed_before(now: datetime) -> datetime:
+    """Buckets ending before this can no longer receive messages"""
+    return now - BUCKET_SPAN
@@ -0,0 +1,38 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+class PeriodicRefresh(ABC):
+    """In-process state loaded at startup and re-synced from MongoDB on an interval"""
+
+    description = "in-process state"  # Named in refresh failure logs
+    interval: float = 30  # Seconds between refreshes
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    @abstractmethod
+    async def refresh(self):
+        """Pull whatever changed since the last refresh"""
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Failed to refresh %s", self.description)
+
+    async def start(self, interval: Optional[float] = None):
+        """Load the current state, then keep it fresh in the background"""
+        await self.refresh()
+        self._task = asyncio.create_task(self._run(interval or self.interval))
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
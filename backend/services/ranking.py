@@ -0,0 +1,72 @@
+from datetime import datetime
+from typing import List
+import numpy as np
+
+# Relative weight of each signal in a candidate's score
+WEIGHTS = {
+    "interests": 0.4,
+    "age": 0.2,
+    "distance": 0.25,
+    "recency": 0.15,
+}
+RECENCY_HALF_LIFE_DAYS = 14
+UNKNOWN_DISTANCE_SCORE = 0.5
+
+def _interest_overlap(user_interests: List[str], candidates: List[dict]) -> np.ndarray:
+    """Jaccard similarity between the user's interests and each candidate's"""
+    user_set = {interest.lower() for interest in user_interests}
+    counts = np.fromiter((len(c.get("interests") or ()) for c in candidates), dtype=np.int64, count=len(candidates))
+    if not user_set or not counts.any():
+        return np.zeros(len(candidates))
+
+    # Flatten every candidate's interests, tagged with the candidate's index
+    flat = np.array([interest.lower() for c in candidates for interest in c.get("interests") or ()])
+    owners = np.repeat(np.arange(len(candidates)), counts)
+    shared = np.bincount(owners, weights=np.isin(flat, list(user_set)), minlength=len(candidates))
+    union = counts + len(user_set) - shared
+    return np.divide(shared, union, out=np.zeros(len(candidates)), where=union > 0)
+
+def _age_closeness(preferences: dict, candidates: List[dict]) -> np.ndarray:
+    """1.0 at the middle of the preferred age range, falling to 0.0 at its edges"""
+    min_age = preferences.get("min_age", 18)
+    max_age = preferences.get("max_age", 35)
+    ages = np.fromiter((c.get("age", min_age) for c in candidates), dtype=np.float64, count=len(candidates))
+    middle = (min_age + max_age) / 2
+    half_range = max((max_age - min_age) / 2, 1)
+    return np.clip(1 - np.abs(ages - middle) / half_range, 0, 1)
+
+def _distance_closeness(preferences: dict, candidates: List[dict]) -> np.ndarray:
+    """1.0 next door, 0.0 at the edge of max_distance"""
+    distances = np.array([c.get("distance") for c in candidates], dtype=np.float64)
+    max_distance = preferences.get("max_distance", 25)
+    scores = np.clip(1 - distances / max_distance, 0, 1)
+    # None becomes NaN when cast to float
+    return np.where(np.isnan(scores), UNKNOWN_DISTANCE_SCORE, scores)
+
+def _recency(candidates: List[dict]) -> np.ndarray:
+    """Exponential decay on time since the candidate's profile was last updated"""
+    now = datetime.utcnow()
+    timestamps = np.array(
+        [c.get("updated_at") or c.get("created_at") or now for c in candidates],
+        dtype="datetime64[s]"
+    )
+    age_days = (np.datetime64(now, "s") - timestamps).astype(np.float64) / 86400
+    return np.exp2(-np.maximum(age_days, 0) / RECENCY_HALF_LIFE_DAYS)
+
+def score_candidates(user: dict, candidates: List[dict]) -> np.ndarray:
+    """Score candidates for a user; higher is better"""
+    if not candidates:
+        return np.zeros(0)
+    preferences = user.get("preferences") or {}
+    return (
+        WEIGHTS["interests"] * _interest_overlap(user.get("interests") or [], candidates)
+        + WEIGHTS["age"] * _age_closeness(preferences, candidates)
+        + WEIGHTS["distance"] * _distance_closeness(preferences, candidates)
+        + WEIGHTS["recency"] * _recency(candidates)
+    )
+
+def rank_candidates(user: dict, candidates: List[dict]) -> List[dict]:
+    """Return candidates ordered by descending score, ties kept in input order"""
+    scores = score_candidates(user, candidates)
+    order = np.argsort(-scores, kind="stable")
+    return [candidates[i] for i in order]
@@ -0,0 +1,168 @@
+import ipaddress
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Union
+from fastapi import HTTPException, Request
+from services.auth import verify_token
+
+MAX_KEYS = 100000  # Tracked IPs or users per route and scope; least recently seen are dropped
+
+class Limit(NamedTuple):
+    """A token bucket refilling `rate` per second up to `burst`, plus at most `max_requests` per sliding `window` seconds"""
+    rate: float
+    burst: int
+    max_requests: int
+    window: float
+
+# Per route, limits keyed by scope: "ip" for the client address, "user" for the token's user
+ROUTE_LIMITS: Dict[str, Dict[str, Limit]] = {
+    "login": {
+        "ip": Limit(rate=5 / 60, burst=10, max_requests=100, window=3600),
+    },
+    "signup": {
+        "ip": Limit(rate=1 / 60, burst=5, max_requests=20, window=3600),
+    },
+    "swipe": {
+        "ip": Limit(rate=20, burst=100, max_requests=20000, window=3600),
+        "user": Limit(rate=2, burst=20, max_requests=1000, window=3600),
+    },
+    # Each batch also costs one "swipe" token per swipe it carries
+    "swipe_batch": {
+        "ip": Limit(rate=2, burst=20, max_requests=2000, window=3600),
+        "user": Limit(rate=0.2, burst=5, max_requests=100, window=3600),
+    },
+}
+
+enabled = True  # Switched off with RATE_LIMITING=0, e.g. for load tests
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+# Proxies allowed to report the client address in X-Forwarded-For, set from TRUSTED_PROXIES
+trusted_proxies: List[Network] = []
+
+def parse_networks(value: str) -> List[Network]:
+    """Parse a comma-separated list of addresses and CIDR ranges"""
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in value.split(",") if part.strip()]
+
+def _is_trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+def client_ip(request: Request) -> str:
+    """The client's address, read through X-Forwarded-For when the peer is a trusted proxy
+    
+    Entries are walked from the right, skipping trusted proxies, so a client
+    cannot pick its own key by sending a forged header.
+    """
+    address = request.client.host if request.client else "unknown"
+    if not _is_trusted(address):
+        return address
+    forwarded = [
+        part.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for part in header.split(",")
+        if part.strip()
+    ]
+    for hop in reversed(forwarded):
+        address = hop
+        if not _is_trusted(hop):
+            break
+    return address
+
+class RateLimiter:
+    """Token bucket and sliding-window counter per key, held in one bounded LRU
+
+    Each key costs a five-item list: bucket tokens, last refill, current
+    window index, and the request counts of the current and previous
+    windows. The sliding window is estimated from the two fixed windows.
+    A hit costing more than the burst is allowed from a full bucket and
+    leaves it in debt, so the long-run rate still holds.
+    """
+
+    def __init__(self, limit: Limit, max_keys: int = MAX_KEYS):
+        self.limit = limit
+        self.max_keys = max_keys
+        self._state: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def hit(self, key: str, cost: int = 1, now: Optional[float] = None) -> float:
+        """Record a request worth `cost` units, returning 0 if allowed or the seconds to wait before retrying"""
+        limit = self.limit
+        now = time.monotonic() if now is None else now
+        window_index = int(now // limit.window)
+
+        state = self._state.get(key)
+        if state is None:
+            state = [limit.burst, now, window_index, 0, 0]
+            self._state[key] = state
+            while len(self._state) > self.max_keys:
+                self._state.popitem(last=False)
+        else:
+            self._state.move_to_end(key)
+
+        tokens, updated, index, current, previous = state
+        tokens = min(limit.burst, tokens + (now - updated) * limit.rate)
+        if window_index != index:
+            previous = current if window_index == index + 1 else 0
+            current = 0
+            index = window_index
+        elapsed = now - index * limit.window
+        estimate = previous * (1 - elapsed / limit.window) + current
+
+        needed = min(cost, limit.burst)
+        if tokens < needed:
+            state[:] = [tokens, now, index, current, previous]
+            return (needed - tokens) / limit.rate
+        if estimate + cost > limit.max_requests:
+            state[:] = [tokens, now, index, current, previous]
+            return limit.window - elapsed
+        state[:] = [tokens - cost, now, index, current + cost, previous]
+        return 0
+
+def _user_id(request: Request) -> Optional[str]:
+    # Verified tokens are memoized, so this costs no signature check or database query
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    payload = verify_token(token)
+    return payload.get("user_id") if payload else None
+
+_limiters: Dict[str, Dict[str, RateLimiter]] = {}
+
+def _route_limiters(route: str) -> Dict[str, RateLimiter]:
+    # Shared per route, so charge() and the route's own dependency draw on the same buckets
+    limiters = _limiters.get(route)
+    if limiters is None:
+        limiters = {scope: RateLimiter(limit) for scope, limit in ROUTE_LIMITS[route].items()}
+        _limiters[route] = limiters
+    return limiters
+
+def charge(route: str, request: Request, cost: int = 1):
+    """Spend `cost` units of a route's limits, raising 429 if any scope is exhausted"""
+    if not enabled:
+        return
+    limiters = _route_limiters(route)
+    keys = {"ip": client_ip(request)}
+    if "user" in limiters:
+        user_id = _user_id(request)
+        if user_id:
+            keys["user"] = user_id
+    for scope, key in keys.items():
+        retry_after = limiters[scope].hit(key, cost) if scope in limiters else 0
+        if retry_after:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+
+def rate_limit(route: str):
+    """Dependency enforcing a route's limits before the handler, authentication or any query runs"""
+    _route_limiters(route)
+
+    async def check(request: Request):
+        charge(route, request)
+
+    return check
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set
+from fastapi import WebSocket
+from fastapi.encoders import jsonable_encoder
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+from services import database
+
+logger = logging.getLogger(__name__)
+
+SEND_TIMEOUT = 5  # Seconds before a stuck socket is dropped
+MAX_PENDING_EVENTS = 10000  # Outbound events queued before new ones are dropped
+EVENTS_COLLECTION = "events"
+EVENTS_COLLECTION_SIZE = 16 * 1024 * 1024  # Bytes kept in the capped events collection
+
+Deliver = Callable[[str, dict], Awaitable[None]]
+
+class Broker(ABC):
+    """Fans events out to every worker; each worker then delivers to its own sockets"""
+
+    async def start(self, deliver: Deliver):
+        self.deliver = deliver
+
+    @abstractmethod
+    async def publish(self, user_id: str, event: dict):
+        """Send an event for a user to every worker"""
+
+    async def close(self):
+        pass
+
+class LocalBroker(Broker):
+    """Single-worker broker that delivers straight to this process's sockets"""
+
+    async def publish(self, user_id: str, event: dict):
+        await self.deliver(user_id, event)
+
+class MongoBroker(Broker):
+    """Multi-worker stand-in broker built on a capped collection and tailable cursors
+
+    Every worker inserts events into the same capped collection and tails it,
+    so events reach sockets held by any uvicorn worker without extra
+    infrastructure.
+    """
+
+    def __init__(self, poll_interval: float = 0.5):
+        self.poll_interval = poll_interval
+        self._task: Optional[asyncio.Task] = None
+
+    def _collection(self):
+        return database.db[EVENTS_COLLECTION]
+
+    async def start(self, deliver: Deliver):
+        await super().start(deliver)
+        try:
+            await database.db.create_collection(EVENTS_COLLECTION, capped=True, size=EVENTS_COLLECTION_SIZE)
+        except CollectionInvalid:
+            pass  # Another worker created it first
+        latest = await self._collection().find_one({}, sort=[("$natural", -1)])
+        self._task = asyncio.create_task(self._tail(latest["_id"] if latest else None))
+
+    async def publish(self, user_id: str, event: dict):
+        await self._collection().insert_one({"user_id": user_id, "event": event})
+
+    async def _tail(self, last_id):
+        while True:
+            query = {"_id": {"$gt": last_id}} if last_id else {}
+            cursor = self._collection().find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+            try:
+                async for document in cursor:
+                    last_id = document["_id"]
+                    await self.deliver(document["user_id"], document["event"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Event tail failed; reopening")
+            # Tailable cursors die on an empty collection, so retry after a pause
+            await asyncio.sleep(self.poll_interval)
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+class RealtimeHub:
+    """Pushes events to users' open WebSockets, keyed by user ID"""
+
+    def __init__(self):
+        self.broker: Broker = LocalBroker()
+        self._connections: Dict[str, Set[WebSocket]] = defaultdict(set)
+        self._outbox: Optional[asyncio.Queue] = None
+        self._pump: Optional[asyncio.Task] = None
+
+    async def start(self, broker: Optional[Broker] = None):
+        if broker is not None:
+            self.broker = broker
+        await self.broker.start(self._deliver)
+        self._outbox = asyncio.Queue(maxsize=MAX_PENDING_EVENTS)
+        self._pump = asyncio.create_task(self._run_pump())
+
+    def connect(self, user_id: str, websocket: WebSocket):
+        self._connections[user_id].add(websocket)
+
+    def disconnect(self, user_id: str, websocket: WebSocket):
+        sockets = self._connections.get(user_id)
+        if sockets is not None:
+            sockets.discard(websocket)
+            if not sockets:
+                del self._connections[user_id]
+
+    def publish(self, user_ids: Iterable[str], event: dict):
+        """Queue an event for users without waiting on the broker or their sockets"""
+        if self._outbox is None:
+            return
+        event = jsonable_encoder(event)
+        for user_id in user_ids:
+            try:
+                self._outbox.put_nowait((user_id, event))
+            except asyncio.QueueFull:
+                logger.warning("Dropping realtime event for user %s; outbox full", user_id)
+
+    def publish_match(self, match: dict):
+        """Tell both users about a new match"""
+        for user_id, other_user_id in ((match["user1_id"], match["user2_id"]), (match["user2_id"], match["user1_id"])):
+            self.publish([user_id], {
+                "type": "match",
+                "match_id": match["id"],
+                "user_id": other_user_id,
+                "created_at": match["created_at"]
+            })
+
+    def publish_message(self, message: dict):
+        """Send a new message to its receiver and the sender's other sessions"""
+        self.publish([message["receiver_id"], message["sender_id"]], {
+            "type": "message",
+            "message": {
+                "id": message["id"],
+                "match_id": message["match_id"],
+                "sender_id": message["sender_id"],
+                "receiver_id": message["receiver_id"],
+                "content": message["content"],
+                "created_at": message["created_at"],
+                "is_read": False
+            }
+        })
+
+    def publish_read(self, match_id: str, reader_id: str, other_user_id: str, message_id: str):
+        """Tell the other user how far the reader has read a conversation"""
+        self.publish([other_user_id], {
+            "type": "read",
+            "match_id": match_id,
+            "user_id": reader_id,
+            "up_to": message_id
+        })
+
+    async def _run_pump(self):
+        while True:
+            user_id, event = await self._outbox.get()
+            try:
+                await self.broker.publish(user_id, event)
+            except Exception:
+                logger.exception("Failed to publish realtime event")
+
+    async def _deliver(self, user_id: str, event: dict):
+        sockets = list(self._connections.get(user_id, ()))
+        if not sockets:
+            return
+        results = await asyncio.gather(
+            *(asyncio.wait_for(socket.send_json(event), SEND_TIMEOUT) for socket in sockets),
+            return_exceptions=True
+        )
+        for socket, result in zip(sockets, results):
+            if isinstance(result, Exception):
+                self.disconnect(user_id, socket)
+
+    async def close(self):
+        if self._pump:
+            self._pump.cancel()
+            await asyncio.gather(self._pump, return_exceptions=True)
+            self._pump = None
+        self._outbox = None
+        await self.broker.close()
+        for sockets in list(self._connections.values()):
+            for socket in list(sockets):
+                try:
+                    await socket.close()
+                except Exception:
+                    pass
+        self._connections.clear()
+
+realtime_hub = RealtimeHub()
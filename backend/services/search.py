@@ -0,0 +1,38 @@
+import re
+from collections import Counter
+from datetime import datetime
+from typing import List, Tuple
+
+MIN_TERM_LENGTH = 2
+MAX_QUERY_TERMS = 10
+
+_TOKEN = re.compile(r"\w+")
+_EPOCH = datetime(1970, 1, 1)
+
+RankKey = Tuple[int, int, float, str]
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens, dropping ones too short to be useful"""
+    return [token for token in _TOKEN.findall(text.lower()) if len(token) >= MIN_TERM_LENGTH]
+
+def index_terms(text: str) -> List[str]:
+    """Distinct terms a message is indexed under"""
+    return sorted(set(tokenize(text)))
+
+def query_terms(query: str) -> List[str]:
+    """Distinct search terms in the order typed, capped at MAX_QUERY_TERMS"""
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+def rank_key(document: dict, terms: List[str]) -> RankKey:
+    """Sort key putting messages that match more query terms, more often and more recently first"""
+    counts = Counter(tokenize(document["content"]))
+    matched = sum(1 for term in terms if counts[term])
+    frequency = sum(counts[term] for term in terms)
+    age = (document["created_at"] - _EPOCH).total_seconds()
+    return (-matched, -frequency, -age, document["id"])
+
+def rank(documents: List[dict], terms: List[str]) -> List[Tuple[RankKey, dict]]:
+    """Documents paired with their rank keys, best first"""
+    ranked = [(rank_key(document, terms), document) for document in documents]
+    ranked.sort(key=lambda item: item[0])
+    return ranked
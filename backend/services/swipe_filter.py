@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+from bson.int64 import Int64
+from services.database import DatabaseService
+
+INITIAL_CAPACITY = 1000  # Swipes a new filter is sized for
+GROWTH_FACTOR = 4  # Capacity multiplier when a filter is rebuilt
+FALSE_POSITIVE_RATE = 0.01  # Share of unseen candidates wrongly hidden
+CACHE_TTL = 60  # Seconds a filter is trusted before reloading from Mongo
+MAX_CACHED_FILTERS = 10000
+
+WORD_BITS = 64
+WORD_MASK = (1 << WORD_BITS) - 1
+
+def _to_int64(word: int) -> Int64:
+    """Store an unsigned 64-bit word as BSON's signed int64"""
+    return Int64(word - (1 << WORD_BITS) if word >= 1 << (WORD_BITS - 1) else word)
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string IDs, stored as 64-bit words"""
+
+    def __init__(self, capacity: int, words: Optional[List[int]] = None, count: int = 0):
+        self.capacity = capacity
+        size = -capacity * math.log(FALSE_POSITIVE_RATE) / (math.log(2) ** 2)
+        self.num_words = max(1, math.ceil(size / WORD_BITS))
+        self.num_bits = self.num_words * WORD_BITS
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.words = [w & WORD_MASK for w in words] if words else [0] * self.num_words
+        self.count = count
+
+    def _positions(self, item: str) -> List[int]:
+        # Double hashing: h1 + i * h2 yields num_hashes independent-enough bits
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def masks(self, item: str) -> Dict[int, int]:
+        """Word index -> OR mask setting the item's bits"""
+        masks: Dict[int, int] = {}
+        for position in self._positions(item):
+            index, bit = divmod(position, WORD_BITS)
+            masks[index] = masks.get(index, 0) | (1 << bit)
+        return masks
+
+    def add(self, item: str) -> Dict[int, int]:
+        masks = self.masks(item)
+        for index, mask in masks.items():
+            self.words[index] |= mask
+        self.count += 1
+        return masks
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.words[index] & mask == mask for index, mask in self.masks(item).items())
+
+    @classmethod
+    def build(cls, items: Iterable[str], capacity: int) -> "BloomFilter":
+        items = list(items)
+        while capacity < len(items):
+            capacity *= GROWTH_FACTOR
+        bloom = cls(capacity)
+        for item in items:
+            bloom.add(item)
+        return bloom
+
+    def to_document(self, user_id: str) -> dict:
+        return {
+            "user_id": user_id,
+            "capacity": self.capacity,
+            "count": self.count,
+            "words": [_to_int64(word) for word in self.words]
+        }
+
+class SwipeFilterStore:
+    """Per-user Bloom filters of swiped IDs, persisted in Mongo and cached in process"""
+
+    def __init__(self, ttl: float = CACHE_TTL, max_cached: int = MAX_CACHED_FILTERS):
+        self.ttl = ttl
+        self.max_cached = max_cached
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _remember(self, user_id: str, bloom: BloomFilter):
+        self._cache[user_id] = (bloom, time.monotonic())
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+
+    async def get(self, user_id: str) -> BloomFilter:
+        """Get the user's swiped-ID filter, building it from swipe history if missing"""
+        cached = self._cache.get(user_id)
+        if cached and time.monotonic() - cached[1] < self.ttl:
+            self._cache.move_to_end(user_id)
+            return cached[0]
+
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            document = await DatabaseService.get_swipe_filter(user_id)
+            if document:
+                bloom = BloomFilter(document["capacity"], document["words"], document["count"])
+            else:
+                bloom = await self._rebuild(user_id, INITIAL_CAPACITY)
+            self._remember(user_id, bloom)
+        self._locks.pop(user_id, None)
+        return bloom
+
+    async def add(self, user_id: str, swiped_id: str):
+        """Record a swipe in the user's filter"""
+        await self.add_many(user_id, [swiped_id])
+
+    async def add_many(self, user_id: str, swiped_ids: List[str]):
+        """Record several swipes in the user's filter with a single update"""
+        if not swiped_ids:
+            return
+        bloom = await self.get(user_id)
+        if bloom.count + len(swiped_ids) > bloom.capacity:
+            # Regrow from the swipes collection, which already holds these swipes
+            bloom = await self._rebuild(user_id, bloom.capacity * GROWTH_FACTOR)
+            self._remember(user_id, bloom)
+            return
+
+        masks: Dict[int, int] = {}
+        for swiped_id in swiped_ids:
+            for index, mask in bloom.add(swiped_id).items():
+                masks[index] = masks.get(index, 0) | mask
+        updated = await DatabaseService.add_swipe_filter_bits(
+            user_id,
+            bloom.capacity,
+            {index: _to_int64(mask) for index, mask in masks.items()},
+            count=len(swiped_ids)
+        )
+        if not updated:
+            # Another worker resized the filter; reload on next use
+            self._cache.pop(user_id, None)
+
+    async def _rebuild(self, user_id: str, capacity: int) -> BloomFilter:
+        swiped_user_ids = await DatabaseService.get_user_swipes(user_id)
+        bloom = BloomFilter.build(swiped_user_ids, capacity)
+        await DatabaseService.save_swipe_filter(bloom.to_document(user_id))
+        return bloom
+
+swipe_filters = SwipeFilterStore()
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional
+from models.match import Match
+from models.swipe import SwipeAction
+from services.database import DatabaseService, ID_PROJECTION, match_pair_key
+from services.realtime import realtime_hub
+from services.swipe_filter import swipe_filters
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 0.05  # Seconds a buffered swipe may wait for its group commit
+MAX_BATCH = 500  # Swipes per group commit
+MAX_QUEUE = 10000  # Buffered swipes before falling back to direct writes
+
+class SwipeOutcome(NamedTuple):
+    error: Optional[str] = None
+    is_match: bool = False
+
+async def record_swipes(swipes: List[SwipeAction]) -> List[SwipeOutcome]:
+    """Write swipes from any number of users with a fixed number of queries
+
+    Targets are checked in one query, swipes inserted in one unordered bulk
+    write, mutual likes found in one query and matches upserted in one bulk
+    write.
+    """
+    errors: List[Optional[str]] = [None] * len(swipes)
+
+    targets = await DatabaseService.get_users_by_ids(
+        list({swipe.swiped_id for swipe in swipes}),
+        projection=ID_PROJECTION
+    )
+    target_ids = {target["id"] for target in targets}
+
+    pending = []
+    seen = set()
+    for index, swipe in enumerate(swipes):
+        pair = (swipe.swiper_id, swipe.swiped_id)
+        if swipe.swiped_id not in target_ids:
+            errors[index] = "User not found"
+        elif pair in seen:
+            errors[index] = "Already swiped on this user"
+        else:
+            seen.add(pair)
+            pending.append(index)
+
+    # The unique index flags swipes recorded by earlier requests
+    inserted = await DatabaseService.create_swipes([swipes[index].dict() for index in pending])
+    recorded: Dict[str, List[str]] = defaultdict(list)
+    for index, was_inserted in zip(pending, inserted):
+        if was_inserted:
+            recorded[swipes[index].swiper_id].append(swipes[index].swiped_id)
+        else:
+            errors[index] = "Already swiped on this user"
+
+    likes = [
+        (swipe.swiper_id, swipe.swiped_id) for index, swipe in enumerate(swipes)
+        if errors[index] is None and swipe.action == "like"
+    ]
+    mutual = set()
+    if likes:
+        reciprocal = set(await DatabaseService.get_likes_between(
+            list({swiped_id for _, swiped_id in likes}),
+            list({swiper_id for swiper_id, _ in likes})
+        ))
+        mutual = {(swiper_id, swiped_id) for swiper_id, swiped_id in likes if (swiped_id, swiper_id) in reciprocal}
+
+    # Both halves of a mutual like in the same batch collapse to one match
+    matches = {
+        match_pair_key(swiper_id, swiped_id): Match(user1_id=swiper_id, user2_id=swiped_id).dict()
+        for swiper_id, swiped_id in mutual
+    }
+    created, *_ = await asyncio.gather(
+        DatabaseService.create_matches(list(matches.values())),
+        *(swipe_filters.add_many(swiper_id, swiped_ids) for swiper_id, swiped_ids in recorded.items())
+    )
+    for match in created:
+        realtime_hub.publish_match(match)
+
+    return [
+        SwipeOutcome(errors[index], errors[index] is None and (swipe.swiper_id, swipe.swiped_id) in mutual)
+        for index, swipe in enumerate(swipes)
+    ]
+
+class SwipeBuffer:
+    """Bounded in-process queue of swipes written behind in group commits"""
+
+    def __init__(self):
+        self.flush_interval = FLUSH_INTERVAL
+        self.max_batch = MAX_BATCH
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._task is not None
+
+    async def start(self, flush_interval: float = FLUSH_INTERVAL, max_batch: int = MAX_BATCH, max_queue: int = MAX_QUEUE):
+        """Start accepting swipes; flush_interval and max_batch trade latency for durability"""
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    def offer(self, swipe: SwipeAction) -> bool:
+        """Queue a swipe, returning False if buffering is off or the queue is full"""
+        if not self.enabled:
+            return False
+        try:
+            self._queue.put_nowait(swipe)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            swipe = await self._queue.get()
+            if swipe is None:
+                return
+            batch = [swipe]
+            deadline = loop.time() + self.flush_interval
+            stop = False
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    swipe = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if swipe is None:
+                    stop = True
+                    break
+                batch.append(swipe)
+            await self._flush(batch)
+            if stop:
+                return
+
+    async def _flush(self, batch: List[SwipeAction]):
+        try:
+            await record_swipes(batch)
+        except Exception:
+            logger.exception("Failed to flush %d buffered swipes", len(batch))
+
+    async def close(self):
+        """Stop accepting swipes and flush everything already queued"""
+        if not self._task:
+            return
+        task, self._task = self._task, None
+        # The sentinel queues behind every accepted swipe, so all are flushed
+        await self._queue.put(None)
+        await task
+
+swipe_buffer = SwipeBuffer()
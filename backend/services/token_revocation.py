@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from services import database
+from services.periodic_refresh import PeriodicRefresh
+
+REFRESH_INTERVAL = 10  # Seconds before a logout on another worker takes effect here
+# Overlap between refreshes: a revocation can commit after a later-stamped one has been read
+CLOCK_SKEW = timedelta(seconds=5)
+
+class TokenRevocations(PeriodicRefresh):
+    """In-process set of revoked token digests, shared across workers through MongoDB"""
+
+    description = "token revocations"
+    interval = REFRESH_INTERVAL
+
+    def __init__(self):
+        super().__init__()
+        self._revoked: Dict[str, datetime] = {}  # digest -> token expiry
+        self._watermark: Optional[datetime] = None
+
+    def is_revoked(self, digest: str) -> bool:
+        return digest in self._revoked
+
+    async def revoke(self, digest: str, expires_at: datetime):
+        """Reject a token from now on; the record expires along with the token"""
+        self._revoked[digest] = expires_at
+        await database.get_revoked_tokens_collection().update_one(
+            {"digest": digest},
+            {"$setOnInsert": {"digest": digest, "expires_at": expires_at, "revoked_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    async def refresh(self):
+        """Pull tokens revoked since the last refresh and forget expired ones"""
+        query = {"revoked_at": {"$gt": self._watermark - CLOCK_SKEW}} if self._watermark else {}
+        async for record in database.get_revoked_tokens_collection().find(query, {"_id": 0}):
+            self._revoked[record["digest"]] = record["expires_at"]
+            if self._watermark is None or record["revoked_at"] > self._watermark:
+                self._watermark = record["revoked_at"]
+        now = datetime.utcnow()
+        for digest in [digest for digest, expires_at in self._revoked.items() if expires_at <= now]:
+            del self._revoked[digest]
+
+token_revocations = TokenRevocations()
@@ -0,0 +1,39 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+class TTLCache(Generic[V]):
+    """Bounded LRU whose entries expire at a deadline; least recently used entries go first"""
+
+    def __init__(self, max_entries: int, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[V, float]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """The live value for a key, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= self.clock():
+            # Expired entries are evicted rather than served
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: Hashable, value: V, expires_at: Optional[float] = None):
+        """Store a value until `expires_at` on the cache's clock, or for the default ttl"""
+        self._entries[key] = (value, self.clock() + self.ttl if expires_at is None else expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,45 @@
+from typing import Optional
+from services.database import DatabaseService, AUTH_USER_PROJECTION
+from services.ttl_cache import TTLCache
+
+CACHE_TTL = 30  # Seconds a profile or deactivation on another worker can take to show up here
+MAX_ENTRIES = 50000
+
+class UserCache:
+    """TTL/LRU cache of authenticated users by ID, with hit/miss counters for tuning"""
+
+    def __init__(self, ttl: float = CACHE_TTL, max_entries: int = MAX_ENTRIES):
+        self.hits = 0
+        self.misses = 0
+        self._users: TTLCache[dict] = TTLCache(max_entries, ttl)
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        """The user without their password hash, or None if they do not exist
+
+        The returned dict is shared between requests and must not be modified.
+        """
+        user = self._users.get(user_id)
+        if user is not None:
+            self.hits += 1
+            return user
+
+        self.misses += 1
+        user = await DatabaseService.get_user_by_id(user_id, projection=AUTH_USER_PROJECTION)
+        if user is not None:
+            self._users.put(user_id, user)
+        return user
+
+    def invalidate(self, user_id: str):
+        """Forget a user, e.g. after their profile changes or they deactivate"""
+        self._users.discard(user_id)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._users)
+        }
+
+user_cache = UserCache()
@@ -0,0 +1,30 @@
+import os
+import sys
+import pytest
+from mongomock.collection import Collection
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from services import database  # noqa: E402
+
+_find_and_modify = Collection._find_and_modify
+
+def _find_and_modify_keeping_id(self, query, projection=None, *args, **kwargs):
+    # mongomock re-reads the updated document by _id only when the projection keeps
+    # _id, so an update that changes a filtered field otherwise returns None
+    hide_id = isinstance(projection, dict) and projection.get("_id") == 0
+    if hide_id:
+        projection = {key: value for key, value in projection.items() if key != "_id"} or None
+    document = _find_and_modify(self, query, projection, *args, **kwargs)
+    if hide_id and document:
+        document.pop("_id", None)
+    return document
+
+@pytest.fixture
+def db(monkeypatch):
+    """In-memory Mongo standing in for services.database.db"""
+    monkeypatch.setattr(Collection, "_find_and_modify", _find_and_modify_keeping_id)
+    mock_db = AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(database, "db", mock_db)
+    return mock_db
@@ -0,0 +1,24 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from models.user import UserCreate
+from routes import auth
+from services.database import DatabaseService
+
+def test_concurrent_signup_with_same_email_is_rejected(db, monkeypatch):
+    # Regression: a signup racing past the email check hit the unique index and returned 500
+    async def not_registered_yet(email, projection=None):
+        return None
+
+    monkeypatch.setattr(DatabaseService, "get_user_by_email", not_registered_yet)
+    signup = UserCreate(email="sam@example.com", password="secret", name="Sam", age=30)
+
+    async def run():
+        await db.users.create_index("email", unique=True)
+        await auth.signup(signup)
+        with pytest.raises(HTTPException) as raised:
+            await auth.signup(signup)
+        return raised.value
+
+    error = asyncio.run(run())
+    assert (error.status_code, error.detail) == (400, "Email already registered")
@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime
+from services import database, deck
+from services.deck import DeckManager
+from services.interest_index import InterestIndex
+
+def _user(user_id: str) -> dict:
+    now = datetime.utcnow()
+    return {
+        "id": user_id, "age": 25, "interests": [], "is_active": True,
+        "preferences": {"min_age": 18, "max_age": 35}, "created_at": now, "updated_at": now
+    }
+
+def test_refill_scans_past_swiped_users(db, monkeypatch):
+    # Regression: a scan cap full of swiped users used to mark the deck exhausted
+    monkeypatch.setattr(database, "MAX_CANDIDATE_SCAN", 20)
+    swiped = {f"a{i:03d}" for i in range(30)}
+    unswiped = [f"b{i:03d}" for i in range(14)]
+
+    async def get_filter(user_id):
+        return swiped
+
+    monkeypatch.setattr(deck.swipe_filters, "get", get_filter)
+    viewer = _user("viewer")
+
+    async def run():
+        await db.users.insert_many([_user(user_id) for user_id in sorted(swiped) + unswiped])
+        page, _ = await DeckManager().peek(viewer, 10)
+        return page
+
+    page = asyncio.run(run())
+    assert len(page) == 10
+    assert all(entry.candidate_id in unswiped for entry in page)
+
+def test_refill_marks_exhausted_when_pool_runs_dry(db, monkeypatch):
+    async def get_filter(user_id):
+        return set()
+
+    monkeypatch.setattr(deck.swipe_filters, "get", get_filter)
+    viewer = _user("viewer")
+    decks = DeckManager()
+
+    async def run():
+        await db.users.insert_many([_user(f"c{i}") for i in range(3)])
+        page, _ = await decks.peek(viewer, 10)
+        return page
+
+    page = asyncio.run(run())
+    assert len(page) == 3
+    assert decks._decks["viewer"].is_exhausted()
+
+def test_cursor_from_another_worker_resumes_without_overlap(db, monkeypatch):
+    # Regression: a cursor from another worker's deck started again from the head
+    async def get_filter(user_id):
+        return set()
+
+    monkeypatch.setattr(deck.swipe_filters, "get", get_filter)
+    viewer = _user("viewer")
+    worker_a, worker_b = DeckManager(deck_size=4), DeckManager(deck_size=4)
+
+    async def run():
+        await db.users.insert_many([_user(f"c{i}") for i in range(10)])
+        first, generation = await worker_a.peek(viewer, 4)
+        last = first[-1]
+        second, _ = await worker_b.peek(viewer, 4, last.seq, generation, last.resume_after)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert [entry.candidate_id for entry in first] == ["c0", "c1", "c2", "c3"]
+    assert [entry.candidate_id for entry in second] == ["c4", "c5", "c6", "c7"]
+
+def test_interest_refills_resume_after_ids_already_looked_up(db, monkeypatch):
+    async def get_filter(user_id):
+        return set()
+
+    monkeypatch.setattr(deck.swipe_filters, "get", get_filter)
+    monkeypatch.setattr(deck, "ID_LOOKUP_CHUNK", 2)
+    index = InterestIndex()
+    monkeypatch.setattr(deck, "interest_index", index)
+    looked_up = []
+    lookup = database.DatabaseService.get_candidates_by_ids
+
+    async def spy(preferences, candidate_ids, **kwargs):
+        looked_up.append(list(candidate_ids))
+        return await lookup(preferences, candidate_ids, **kwargs)
+
+    monkeypatch.setattr(deck.DatabaseService, "get_candidates_by_ids", spy)
+    viewer = dict(_user("viewer"), interests=["jazz"])
+    viewer["preferences"] = dict(viewer["preferences"], min_shared_interests=1)
+    # Every other user is too old, so lookups keep dropping candidates
+    users = [dict(_user(f"d{i}"), interests=["jazz"], age=25 if i % 2 else 60) for i in range(10)]
+    for user in users:
+        index.update(user["id"], user["interests"])
+    decks = DeckManager(deck_size=2)
+
+    async def run():
+        await db.users.insert_many(users)
+        first, generation = await decks.peek(viewer, 2)
+        second, _ = await decks.peek(viewer, 2, first[-1].seq, generation)
+        return first + second
+
+    entries = asyncio.run(run())
+    assert [entry.candidate_id for entry in entries] == ["d1", "d3", "d5", "d7"]
+    ids = [candidate_id for chunk in looked_up for candidate_id in chunk]
+    assert len(ids) == len(set(ids))
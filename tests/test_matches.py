@@ -0,0 +1,57 @@
+import asyncio
+from datetime import datetime, timedelta
+from fastapi import Response
+from routes.matches import get_matches
+from services.database import DatabaseService
+from services.pagination import decode_cursor
+
+NOW = datetime(2026, 1, 1)
+
+def _match(match_id: str, other_user_id: str, minutes_ago: int) -> dict:
+    created_at = NOW - timedelta(minutes=minutes_ago)
+    return {
+        "id": match_id, "user1_id": "me", "user2_id": other_user_id, "is_active": True,
+        "created_at": created_at, "activity_at": created_at
+    }
+
+def _user(user_id: str) -> dict:
+    return {"id": user_id, "name": user_id.title(), "photos": [], "is_active": True}
+
+def test_orphaned_match_does_not_end_pagination(db):
+    # Regression: an orphaned match dropped after $limit cut the page short and left no cursor
+    async def run():
+        await db.users.insert_one(_user("alice"))
+        await db.matches.insert_many([_match("m2", "ghost", 1), _match("m1", "alice", 2)])
+        first_response = Response()
+        first = await get_matches(first_response, limit=1, cursor=None, current_user={"id": "me"})
+        cursor = first_response.headers.get("X-Next-Cursor")
+        second = await get_matches(Response(), limit=1, cursor=cursor, current_user={"id": "me"})
+        return first, cursor, second
+
+    first, cursor, second = asyncio.run(run())
+    assert first == []
+    assert decode_cursor(cursor)["i"] == "m2"
+    assert [match.id for match in second] == ["m1"]
+
+def test_matches_without_activity_at_page_after_backfill(db):
+    # Regression: a page ending on a match from before activity_at was stored raised KeyError
+    legacy = _match("m0", "bob", 3)
+    del legacy["activity_at"]
+
+    async def run():
+        await db.users.insert_many([_user("alice"), _user("bob")])
+        await db.matches.insert_many([_match("m1", "alice", 1), legacy])
+        # Runs at startup
+        await DatabaseService.backfill_activity_at()
+        pages = []
+        cursor = None
+        for _ in range(3):
+            response = Response()
+            pages.append(await get_matches(response, limit=1, cursor=cursor, current_user={"id": "me"}))
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+        return pages
+
+    pages = asyncio.run(run())
+    assert [[match.id for match in page] for page in pages] == [["m1"], ["m0"], []]
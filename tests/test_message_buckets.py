@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+import bson
+from services import message_buckets
+from services.message_buckets import append_update, build_bucket, compress, unpack, BUCKET_SPAN
+
+START = datetime(2026, 1, 1)
+
+def _message(index: int, **fields) -> dict:
+    message = {
+        "_id": f"oid{index}", "id": f"msg{index}", "match_id": "m1", "sender_id": "bob", "receiver_id": "alice",
+        "content": f"hello {index}", "created_at": START + timedelta(minutes=index), "is_read": False
+    }
+    message.update(fields)
+    return message
+
+def test_build_bucket_strips_per_message_fields():
+    bucket = build_bucket("m1", [_message(0), _message(1, is_read=True)])
+    assert bucket["_id"] == "m1:msg0"
+    assert bucket["user_ids"] == ["alice", "bob"]
+    assert (bucket["count"], bucket["open"]) == (2, False)
+    assert (bucket["start"], bucket["end"]) == (START, START + timedelta(minutes=1))
+    assert all("_id" not in message and "match_id" not in message for message in bucket["messages"])
+    # Only a set legacy read flag is kept
+    assert ["is_read" in message for message in bucket["messages"]] == [False, True]
+
+def test_unpack_restores_match_id():
+    bucket = build_bucket("m1", [_message(0)])
+    assert unpack(bucket) == [{
+        "id": "msg0", "sender_id": "bob", "receiver_id": "alice", "content": "hello 0",
+        "created_at": START, "match_id": "m1"
+    }]
+
+def test_compressed_bucket_round_trips():
+    bucket = build_bucket("m1", [_message(i) for i in range(50)])
+    compressed = {"match_id": "m1", "compressed": True, "data": compress(bucket["messages"])}
+    assert len(compressed["data"]) < len(bson.encode({"messages": bucket["messages"]}))
+    assert unpack(compressed) == unpack(bucket)
+
+def test_append_update_targets_an_open_recent_bucket():
+    message = _message(0, content="$notAField")
+    query, pipeline = append_update(message)
+    assert query == {"match_id": "m1", "open": True, "start": {"$gte": message["created_at"] - BUCKET_SPAN}}
+    appended = pipeline[0]["$set"]["messages"]["$concatArrays"][1]
+    # Content is wrapped in $literal so it is never read as a field path
+    assert appended == {"$literal": [message_buckets._stored(message)]}
+    assert pipeline[1] == {"$set": {"open": {"$lt": ["$count", message_buckets.BUCKET_SIZE]}}}
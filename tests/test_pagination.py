@@ -0,0 +1,13 @@
+import pytest
+from services.pagination import encode_cursor, decode_cursor
+
+def test_round_trip_is_url_safe():
+    position = {"a": "2026-01-01T00:00:00", "i": "m/1+2", "s": 7}
+    cursor = encode_cursor(position)
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    assert decode_cursor(cursor) == position
+
+@pytest.mark.parametrize("cursor", ["not base64!", encode_cursor([1, 2])[:-1], "W10"])
+def test_malformed_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
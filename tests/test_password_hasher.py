@@ -0,0 +1,45 @@
+import asyncio
+import threading
+import pytest
+from services.auth import PasswordHasher, PasswordHasherBusy
+
+def test_cancelled_caller_keeps_its_slot_until_the_hash_finishes():
+    # Regression: a cancelled request released its slot while its hash still ran in the pool
+    release = threading.Event()
+    hasher = PasswordHasher(workers=1, max_pending=1)
+
+    async def run():
+        waiter = asyncio.create_task(hasher._run(release.wait))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert hasher.pending == 1
+        with pytest.raises(PasswordHasherBusy):
+            await hasher._run(lambda: None)
+        release.set()
+        for _ in range(100):
+            if hasher.pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        return await hasher._run(lambda: "done")
+
+    try:
+        assert asyncio.run(run()) == "done"
+        assert hasher.pending == 0
+    finally:
+        release.set()
+        hasher.close()
+
+def test_hash_round_trip():
+    hasher = PasswordHasher(workers=1)
+
+    async def run():
+        hashed = await hasher.hash("correct horse")
+        return await hasher.verify("correct horse", hashed), await hasher.verify("wrong", hashed)
+
+    try:
+        (valid, replacement), (invalid, _) = asyncio.run(run())
+    finally:
+        hasher.close()
+    assert valid and replacement is None
+    assert not invalid
@@ -0,0 +1,40 @@
+import asyncio
+from services.periodic_refresh import PeriodicRefresh
+
+class Counting(PeriodicRefresh):
+    interval = 0.01
+
+    def __init__(self, fail_first: bool = False):
+        super().__init__()
+        self.calls = 0
+        self.fail_first = fail_first
+
+    async def refresh(self):
+        self.calls += 1
+        if self.fail_first and self.calls == 2:
+            raise RuntimeError("database unavailable")
+
+def test_start_loads_then_refreshes_until_closed():
+    async def run():
+        refresher = Counting()
+        await refresher.start()
+        assert refresher.calls == 1
+        await asyncio.sleep(0.05)
+        await refresher.close()
+        calls = refresher.calls
+        await asyncio.sleep(0.03)
+        return calls, refresher.calls
+
+    calls, later = asyncio.run(run())
+    assert calls > 1
+    assert later == calls
+
+def test_failed_refresh_does_not_stop_the_loop():
+    async def run():
+        refresher = Counting(fail_first=True)
+        await refresher.start()
+        await asyncio.sleep(0.05)
+        await refresher.close()
+        return refresher.calls
+
+    assert asyncio.run(run()) > 2
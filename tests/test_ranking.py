@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+import numpy as np
+from services.ranking import score_candidates, rank_candidates
+
+NOW = datetime.utcnow()
+USER = {"interests": ["Hiking", "jazz"], "preferences": {"min_age": 20, "max_age": 30, "max_distance": 10}}
+
+def _candidate(candidate_id: str, **fields) -> dict:
+    candidate = {"id": candidate_id, "age": 25, "interests": [], "distance": 5.0, "updated_at": NOW}
+    candidate.update(fields)
+    return candidate
+
+def test_each_signal_raises_the_score():
+    week_ago = NOW - timedelta(days=7)
+    base = _candidate("base", updated_at=week_ago)
+    better = [
+        _candidate("interests", interests=["hiking"], updated_at=week_ago),
+        _candidate("distance", distance=1.0, updated_at=week_ago),
+        _candidate("recency"),
+    ]
+    scores = score_candidates(USER, [base] + better)
+    assert all(score > scores[0] for score in scores[1:])
+
+def test_age_at_the_edge_scores_lower_than_the_middle():
+    scores = score_candidates(USER, [_candidate("middle"), _candidate("edge", age=30)])
+    assert scores[0] > scores[1]
+
+def test_unknown_distance_and_missing_fields_are_tolerated():
+    scores = score_candidates(USER, [_candidate("unknown", distance=None, interests=None, updated_at=None, created_at=NOW)])
+    assert np.isfinite(scores).all()
+
+def test_rank_orders_by_score_keeping_ties_stable():
+    candidates = [_candidate("a"), _candidate("b", interests=["jazz"]), _candidate("c")]
+    assert [candidate["id"] for candidate in rank_candidates(USER, candidates)] == ["b", "a", "c"]
+
+def test_no_candidates():
+    assert score_candidates(USER, []).shape == (0,)
+    assert rank_candidates(USER, []) == []
@@ -0,0 +1,73 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from services import rate_limiting
+from services.auth import create_access_token
+from services.rate_limiting import Limit, RateLimiter, charge, client_ip, parse_networks
+
+def _request(user_id: str, host: str = "203.0.113.7") -> Request:
+    token = create_access_token({"user_id": user_id})
+    return Request({
+        "type": "http",
+        "client": (host, 5000),
+        "headers": [(b"authorization", f"Bearer {token}".encode())]
+    })
+
+def test_bucket_allows_burst_then_refills():
+    limiter = RateLimiter(Limit(rate=1, burst=3, max_requests=100, window=60))
+    assert [limiter.hit("k", now=0) for _ in range(3)] == [0, 0, 0]
+    assert limiter.hit("k", now=0) == pytest.approx(1)
+    assert limiter.hit("k", now=1) == 0
+
+def test_window_caps_requests_despite_tokens():
+    limiter = RateLimiter(Limit(rate=100, burst=100, max_requests=5, window=60))
+    assert all(limiter.hit("k", now=10) == 0 for _ in range(5))
+    assert limiter.hit("k", now=10) == pytest.approx(50)
+    # Half way through the next window, half of the previous window still counts
+    assert limiter.hit("k", now=90) == 0
+
+def test_keys_are_independent_and_bounded():
+    limiter = RateLimiter(Limit(rate=1, burst=1, max_requests=10, window=60), max_keys=2)
+    assert limiter.hit("a", now=0) == 0
+    assert limiter.hit("b", now=0) == 0
+    assert limiter.hit("a", now=0) > 0
+    limiter.hit("c", now=0)
+    # "b" was least recently used, so it starts fresh
+    assert limiter.hit("b", now=0) == 0
+
+def test_cost_beyond_burst_drains_into_debt():
+    limiter = RateLimiter(Limit(rate=2, burst=20, max_requests=1000, window=3600))
+    assert limiter.hit("k", cost=100, now=0) == 0
+    # 80 tokens of debt plus one for the next swipe, refilled at 2 per second
+    assert limiter.hit("k", now=0) == pytest.approx(40.5)
+
+def test_batches_count_each_swipe_against_swipe_limits(monkeypatch):
+    # Regression: batches were charged per request, allowing 100x the single-swipe cap
+    monkeypatch.setattr(rate_limiting, "enabled", True)
+    monkeypatch.setattr(rate_limiting, "_limiters", {})
+    request = _request("batcher")
+    charge("swipe", request, cost=100)
+    with pytest.raises(HTTPException) as raised:
+        charge("swipe", request)
+    assert raised.value.status_code == 429
+    assert int(raised.value.headers["Retry-After"]) > 0
+
+def _forwarded(peer: str, forwarded_for: str) -> Request:
+    return Request({
+        "type": "http",
+        "client": (peer, 5000),
+        "headers": [(b"x-forwarded-for", forwarded_for.encode())]
+    })
+
+def test_client_ip_reads_forwarded_for_only_from_trusted_proxies(monkeypatch):
+    # Regression: behind the ingress every client shared the proxy's address and limits
+    monkeypatch.setattr(rate_limiting, "trusted_proxies", parse_networks("10.0.0.0/8"))
+    assert client_ip(_forwarded("10.1.2.3", "198.51.100.4")) == "198.51.100.4"
+    # A forged leftmost entry is ignored; the proxy appended the real peer
+    assert client_ip(_forwarded("10.1.2.3", "1.1.1.1, 198.51.100.4, 10.9.9.9")) == "198.51.100.4"
+    # Untrusted peers cannot choose their key
+    assert client_ip(_forwarded("198.51.100.4", "1.1.1.1")) == "198.51.100.4"
+
+def test_client_ip_ignores_forwarded_for_without_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(rate_limiting, "trusted_proxies", [])
+    assert client_ip(_forwarded("10.1.2.3", "198.51.100.4")) == "10.1.2.3"
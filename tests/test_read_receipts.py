@@ -0,0 +1,71 @@
+import asyncio
+from datetime import datetime, timedelta
+from services import database
+from services.database import DatabaseService, message_is_read
+
+START = datetime(2026, 1, 1)
+
+async def _conversation(db, count: int = 3):
+    await db.matches.insert_one({
+        "id": "m1", "user1_id": "alice", "user2_id": "bob", "is_active": True,
+        "created_at": START, "unread_counts": {"alice": count}
+    })
+    await db.messages.insert_many([
+        {
+            "id": f"msg{i}", "match_id": "m1", "sender_id": "bob", "receiver_id": "alice",
+            "content": f"hi {i}", "created_at": START + timedelta(minutes=i)
+        }
+        for i in range(count)
+    ])
+
+async def _unread(db) -> int:
+    match = await db.matches.find_one({"id": "m1"})
+    return match["unread_counts"]["alice"]
+
+def test_watermark_only_moves_forward(db):
+    async def run():
+        await _conversation(db)
+        results = [
+            await DatabaseService.mark_match_read("m1", "alice", "msg1"),
+            await DatabaseService.mark_match_read("m1", "alice", "msg0"),
+            await DatabaseService.mark_match_read("m1", "alice"),
+            await DatabaseService.mark_match_read("m1", "alice", "missing"),
+        ]
+        positions = await DatabaseService.get_read_positions(["m1"])
+        return results, positions, await _unread(db)
+
+    results, positions, unread = asyncio.run(run())
+    assert results == [("msg1", 2, 1), ("msg0", 0, 1), ("msg2", 1, 0), None]
+    assert positions["m1"]["alice"]["id"] == "msg2"
+    assert unread == 0
+
+def test_concurrent_reads_decrement_the_counter_once(db, monkeypatch):
+    # The first reader counts, then loses the compare-and-set to a second reader and retries
+    count_received = database._count_received
+    raced = []
+
+    async def racing_count(match_id, user_id, after=None, through=None):
+        marked = await count_received(match_id, user_id, after=after, through=through)
+        if not raced:
+            raced.append(None)
+            raced[0] = await DatabaseService.mark_match_read("m1", "alice", "msg1")
+        return marked
+
+    monkeypatch.setattr(database, "_count_received", racing_count)
+
+    async def run():
+        await _conversation(db)
+        result = await DatabaseService.mark_match_read("m1", "alice", "msg2")
+        return result, await _unread(db)
+
+    result, unread = asyncio.run(run())
+    assert raced == [("msg1", 2, 1)]
+    assert result == ("msg2", 1, 0)
+    assert unread == 0
+
+def test_message_is_read_from_watermark_or_legacy_flag():
+    position = {"created_at": START, "id": "msg1"}
+    assert message_is_read({"created_at": START, "id": "msg0"}, position)
+    assert not message_is_read({"created_at": START, "id": "msg2"}, position)
+    assert message_is_read({"created_at": START + timedelta(days=1), "id": "x", "is_read": True}, None)
+    assert not message_is_read({"created_at": START, "id": "msg0"}, None)
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+from services.search import tokenize, index_terms, query_terms, rank, MAX_QUERY_TERMS
+
+NOW = datetime(2026, 1, 1)
+
+def _message(message_id: str, content: str, minutes_ago: int = 0) -> dict:
+    return {"id": message_id, "content": content, "created_at": NOW - timedelta(minutes=minutes_ago)}
+
+def test_tokenize_lowercases_and_drops_short_tokens():
+    assert tokenize("Hi, I'm at the Café!") == ["hi", "at", "the", "café"]
+
+def test_index_terms_are_distinct_and_sorted():
+    assert index_terms("b a b c ca") == ["ca"]
+    assert index_terms("pizza tonight pizza") == ["pizza", "tonight"]
+
+def test_query_terms_keep_typed_order_and_cap():
+    assert query_terms("tonight Pizza tonight") == ["tonight", "pizza"]
+    assert len(query_terms(" ".join(f"term{i}" for i in range(20)))) == MAX_QUERY_TERMS
+
+def test_rank_prefers_more_terms_then_frequency_then_recency():
+    terms = ["pizza", "tonight"]
+    messages = [
+        _message("old-both", "pizza tonight?", minutes_ago=10),
+        _message("new-both", "pizza tonight!", minutes_ago=1),
+        _message("frequent", "pizza pizza pizza"),
+        _message("once", "pizza"),
+    ]
+    assert [message["id"] for _, message in rank(messages, terms)] == ["new-both", "old-both", "frequent", "once"]
+
+def test_rank_keys_break_ties_on_id():
+    messages = [_message("b", "pizza"), _message("a", "pizza")]
+    ranked = rank(messages, ["pizza"])
+    assert [message["id"] for _, message in ranked] == ["a", "b"]
+    assert ranked[0][0] < ranked[1][0]
@@ -0,0 +1,29 @@
+from services.swipe_filter import BloomFilter, WORD_MASK, _to_int64
+
+def test_added_items_are_always_found():
+    bloom = BloomFilter.build([f"user-{i}" for i in range(500)], capacity=1000)
+    assert all(f"user-{i}" in bloom for i in range(500))
+    assert bloom.count == 500
+
+def test_false_positive_rate_stays_near_target():
+    bloom = BloomFilter.build([f"user-{i}" for i in range(1000)], capacity=1000)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300  # Target is 1%; allow generous slack
+
+def test_build_grows_capacity_to_fit():
+    bloom = BloomFilter.build([str(i) for i in range(1500)], capacity=1000)
+    assert bloom.capacity == 4000
+
+def test_round_trips_through_signed_int64_words():
+    bloom = BloomFilter.build(["a", "b", "c"], capacity=100)
+    document = bloom.to_document("owner")
+    restored = BloomFilter(document["capacity"], document["words"], document["count"])
+    assert restored.words == bloom.words
+    assert all(item in restored for item in "abc")
+
+def test_masks_cover_every_bit_add_sets():
+    bloom = BloomFilter(100)
+    masks = bloom.add("x")
+    assert all(bloom.words[index] & mask == mask for index, mask in masks.items())
+    # Stored as signed int64 for Mongo's $bit, the same bits come back unsigned
+    assert all(_to_int64(mask) & WORD_MASK == mask for mask in masks.values())
@@ -0,0 +1,87 @@
+import asyncio
+from models.swipe import SwipeAction, SwipeCreate
+from routes import swipes as swipe_routes
+from services import swipe_ingest
+from services.swipe_ingest import SwipeBuffer
+
+def _user(user_id: str) -> dict:
+    return {"id": user_id, "is_active": True, "preferences": {}}
+
+async def _prepare(db, user_ids):
+    await db.users.insert_many([_user(user_id) for user_id in user_ids])
+    await db.swipes.create_index([("swiper_id", 1), ("swiped_id", 1)], unique=True)
+    await db.matches.create_index("pair_key", unique=True)
+
+def _skip_swipe_filters(monkeypatch):
+    # mongomock has no $bit, which the persisted Bloom filters use
+    async def add_many(user_id, swiped_ids):
+        pass
+
+    monkeypatch.setattr(swipe_ingest.swipe_filters, "add_many", add_many)
+    monkeypatch.setattr(swipe_routes.swipe_filters, "add_many", add_many)
+
+def test_buffer_group_commits_and_flushes_on_close(db, monkeypatch):
+    _skip_swipe_filters(monkeypatch)
+    batches = []
+    record = swipe_ingest.record_swipes
+
+    async def spy(batch):
+        batches.append(len(batch))
+        return await record(batch)
+
+    monkeypatch.setattr(swipe_ingest, "record_swipes", spy)
+    likes = [("u0", "u1"), ("u1", "u0"), ("u2", "u3"), ("u3", "u2"), ("u0", "u2"), ("u4", "u0"), ("u4", "u1")]
+
+    async def run():
+        await _prepare(db, [f"u{i}" for i in range(5)])
+        buffer = SwipeBuffer()
+        # A long interval leaves batch size and close() as the only flush triggers
+        await buffer.start(flush_interval=60, max_batch=3)
+        assert all(buffer.offer(SwipeAction(swiper_id=a, swiped_id=b, action="like")) for a, b in likes)
+        await buffer.close()
+        assert not buffer.offer(SwipeAction(swiper_id="u1", swiped_id="u2", action="like"))
+        swipes = await db.swipes.find({}, {"_id": 0, "swiper_id": 1, "swiped_id": 1}).to_list(None)
+        matches = await db.matches.find({}, {"_id": 0, "pair_key": 1}).to_list(None)
+        return swipes, matches
+
+    swipes, matches = asyncio.run(run())
+    assert batches == [3, 3, 1]
+    assert sorted((swipe["swiper_id"], swipe["swiped_id"]) for swipe in swipes) == sorted(likes)
+    assert sorted(match["pair_key"] for match in matches) == ["u0:u1", "u2:u3"]
+
+def test_concurrent_mutual_likes_create_one_match(db, monkeypatch):
+    _skip_swipe_filters(monkeypatch)
+
+    async def add(user_id, swiped_id):
+        pass
+
+    monkeypatch.setattr(swipe_routes.swipe_filters, "add", add)
+
+    async def run():
+        await _prepare(db, ["ann", "ben"])
+        responses = await asyncio.gather(
+            swipe_routes.swipe_user(SwipeCreate(swiped_id="ben", action="like"), _user("ann")),
+            swipe_routes.swipe_user(SwipeCreate(swiped_id="ann", action="like"), _user("ben"))
+        )
+        return responses, await db.matches.count_documents({})
+
+    responses, match_count = asyncio.run(run())
+    assert match_count == 1
+    assert any(response.is_match for response in responses)
+
+def test_single_and_batch_swipes_reject_deactivated_targets(db, monkeypatch):
+    _skip_swipe_filters(monkeypatch)
+
+    async def run():
+        await _prepare(db, ["ann"])
+        await db.users.insert_one(dict(_user("gone"), is_active=False))
+        outcome, = await swipe_ingest.record_swipes([SwipeAction(swiper_id="ann", swiped_id="gone", action="like")])
+        try:
+            await swipe_routes.swipe_user(SwipeCreate(swiped_id="gone", action="like"), _user("ann"))
+        except swipe_routes.HTTPException as exc:
+            return outcome, exc.status_code
+        return outcome, None
+
+    outcome, status_code = asyncio.run(run())
+    assert outcome.error == "User not found"
+    assert status_code == 404
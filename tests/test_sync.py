@@ -0,0 +1,30 @@
+import asyncio
+from datetime import datetime, timedelta
+from routes.sync import sync
+
+NOW = datetime(2026, 1, 1)
+ME = {
+    "id": "me", "email": "me@example.com", "name": "Me", "age": 30, "bio": "", "photos": [],
+    "occupation": "", "education": "", "interests": [], "preferences": {},
+    "created_at": NOW, "updated_at": NOW
+}
+
+def _match(match_id: str, other_user_id: str, minutes: int) -> dict:
+    changed_at = NOW + timedelta(minutes=minutes)
+    return {
+        "id": match_id, "user1_id": "me", "user2_id": other_user_id, "is_active": True,
+        "created_at": changed_at, "activity_at": changed_at, "updated_at": changed_at
+    }
+
+def test_sync_pages_past_orphaned_matches(db):
+    async def run():
+        await db.users.insert_one({"id": "alice", "name": "Alice", "photos": []})
+        await db.matches.insert_many([_match("m1", "ghost", 1), _match("m2", "alice", 2)])
+        first = await sync(since=None, limit=1, current_user=ME)
+        second = await sync(since=first.watermark, limit=2, current_user=ME)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first.has_more and first.matches == []
+    assert first.watermark == NOW + timedelta(minutes=1)
+    assert "m2" in [match.id for match in second.matches]
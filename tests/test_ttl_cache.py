@@ -0,0 +1,42 @@
+from services.ttl_cache import TTLCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(10, ttl=30, clock=clock)
+    cache.put("a", 1)
+    clock.now += 29
+    assert cache.get("a") == 1
+    clock.now += 1
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+def test_explicit_deadline_overrides_ttl():
+    clock = FakeClock()
+    cache = TTLCache(10, clock=clock)
+    cache.put("token", {"sub": "u1"}, expires_at=clock.now + 5)
+    assert cache.get("token") == {"sub": "u1"}
+    clock.now += 5
+    assert cache.get("token") is None
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+def test_discard_forgets_entry():
+    cache = TTLCache(2, ttl=60)
+    cache.put("a", 1)
+    cache.discard("a")
+    cache.discard("missing")
+    assert cache.get("a") is None